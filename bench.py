@@ -0,0 +1,365 @@
+"""Local load test: असली Application + handlers, एक fake Telegram Bot API server के against.
+
+    python bench.py --users 2000 --groups 50
+    python bench.py --users 200 --groups 5 --json bench.json   # CI के लिए छोटा run
+
+कोई network नहीं चाहिए (सब 127.0.0.1 पर), इसलिए CI में भी चल सकता है।
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import socket
+import statistics
+import tempfile
+import time
+from collections import Counter, defaultdict
+from urllib.parse import parse_qsl
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from telegram import Update
+from telegram.ext import TypeHandler
+
+import bot
+
+FINISH_MARKER = "क्विज़ समाप्त"
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "QuizBot", "username": "quiz_bot"}
+
+
+# ---------- FAKE BOT API SERVER ----------
+class FakeBotAPI:
+    # हर method का call count रखता है और हर chat का आखिरी keyboard, ताकि simulated users उसे दबा सकें
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = Counter()
+        self.admins = {}  # group chat_id -> admin user_id
+        self.keyboards = {}  # chat_id -> आखिरी message जिसमें inline keyboard था
+        self.finished = set()
+        self._events = {}
+        self._message_id = 0
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[Route("/bot{token}/{method}", self.handle, methods=["POST"])])
+
+    async def handle(self, request: Request):
+        method = request.path_params["method"]
+        self.calls[method] += 1
+        if request.headers.get("content-type", "").startswith("multipart/"):
+            form = (await request.form()).items()
+        else:
+            form = parse_qsl((await request.body()).decode())
+        params = {}
+        for key, value in form:
+            try:
+                params[key] = json.loads(value) if isinstance(value, str) else value
+            except ValueError:
+                params[key] = value
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return JSONResponse({"ok": True, "result": self.result(method, params)})
+
+    def result(self, method: str, params: dict):
+        if method == "getMe":
+            return BOT_USER
+        if method == "getChatAdministrators":
+            admin = self.admins.get(int(params["chat_id"]))
+            if admin is None:
+                return []
+            return [{"status": "creator", "user": user_dict(admin), "is_anonymous": False}]
+        if method.startswith("send") or method == "editMessageText":
+            return self.message(method, params)
+        return True
+
+    def message(self, method: str, params: dict) -> dict:
+        chat_id = int(params["chat_id"])
+        if method == "editMessageText":
+            message_id = int(params["message_id"])
+        else:
+            self._message_id += 1
+            message_id = self._message_id
+        msg = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": chat_dict(chat_id),
+            "from": BOT_USER,
+            "text": params.get("text", ""),
+        }
+        if params.get("reply_markup"):
+            msg["reply_markup"] = params["reply_markup"]
+            self.keyboards[chat_id] = msg
+            self._notify(chat_id)
+        if FINISH_MARKER in msg["text"]:
+            self.finished.add(chat_id)
+            self._notify(chat_id)
+        return msg
+
+    def _notify(self, chat_id: int):
+        event = self._events.pop(chat_id, None)
+        if event is not None:
+            event.set()
+
+    async def wait_for(self, chat_id: int, check, timeout: float):
+        deadline = time.monotonic() + timeout
+        while True:
+            result = check()
+            if result:
+                return result
+            event = self._events.setdefault(chat_id, asyncio.Event())
+            await asyncio.wait_for(event.wait(), deadline - time.monotonic())
+
+
+def user_dict(user_id: int) -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+
+
+def chat_dict(chat_id: int) -> dict:
+    if chat_id < 0:
+        return {"id": chat_id, "type": "supergroup", "title": f"group{chat_id}"}
+    return {"id": chat_id, "type": "private", "first_name": f"user{chat_id}"}
+
+
+# ---------- SIMULATED CLIENTS ----------
+class Driver:
+    # updates सीधे app.update_queue में (webhook जैसा); group 99 का handler latency नापता है
+    def __init__(self, app, fake: FakeBotAPI, timeout: float):
+        self.app = app
+        self.fake = fake
+        self.timeout = timeout
+        self.latency = defaultdict(list)
+        self.completed = 0
+        self.failed = 0
+        self._update_id = 0
+        self._inflight = {}
+        app.add_handler(TypeHandler(Update, self._done), group=99)
+
+    async def _done(self, update: Update, context):
+        kind, started = self._inflight.pop(update.update_id)
+        self.latency[kind].append(time.perf_counter() - started)
+
+    async def push(self, kind: str, data: dict):
+        self._update_id += 1
+        data["update_id"] = self._update_id
+        self._inflight[self._update_id] = (kind, time.perf_counter())
+        await self.app.update_queue.put(Update.de_json(data, self.app.bot))
+
+    async def command(self, kind: str, user_id: int, chat_id: int, text: str):
+        self._update_id += 1
+        await self.push(
+            kind,
+            {
+                "message": {
+                    "message_id": self._update_id,
+                    "date": int(time.time()),
+                    "chat": chat_dict(chat_id),
+                    "from": user_dict(user_id),
+                    "text": text,
+                    "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}],
+                }
+            },
+        )
+
+    async def tap(self, kind: str, user_id: int, message: dict, data: str):
+        await self.push(
+            kind,
+            {
+                "callback_query": {
+                    "id": str(self._update_id),
+                    "from": user_dict(user_id),
+                    "chat_instance": str(message["chat"]["id"]),
+                    "message": message,
+                    "data": data,
+                }
+            },
+        )
+
+    async def run_quiz(self, user_id: int, chat_id: int):
+        self.fake.finished.discard(chat_id)
+        self.fake.keyboards.pop(chat_id, None)
+        await self.command("quiz_command", user_id, chat_id, "/quiz")
+        seen = None
+        try:
+            while True:
+                # नया keyboard (अगला सवाल) या finish message का इंतज़ार
+                def ready():
+                    if chat_id in self.fake.finished:
+                        return "done"
+                    msg = self.fake.keyboards.get(chat_id)
+                    if msg is not None:
+                        data = msg["reply_markup"]["inline_keyboard"][0][0]["callback_data"]
+                        if data != seen:
+                            return msg
+
+                msg = await self.fake.wait_for(chat_id, ready, self.timeout)
+                if msg == "done":
+                    self.completed += 1
+                    return
+                buttons = [row[0] for row in msg["reply_markup"]["inline_keyboard"]]
+                seen = buttons[0]["callback_data"]
+                await self.tap("handle_answer", user_id, msg, random.choice(buttons)["callback_data"])
+        except asyncio.TimeoutError:
+            self.failed += 1
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def peak_rss_mb() -> float:
+    # Linux पर ru_maxrss KB में होता है
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def gather_limited(limit: int, coros):
+    sem = asyncio.Semaphore(limit)
+
+    async def run(coro):
+        async with sem:
+            await coro
+
+    await asyncio.gather(*(run(c) for c in coros))
+
+
+# ---------- SCENARIO ----------
+async def run_bench(args) -> dict:
+    fake = FakeBotAPI(args.api_latency / 1000)
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(fake.app(), log_level="warning"))
+    server_task = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    tmp = tempfile.mkdtemp(prefix="mcq-bench-")
+    bot.TELEGRAM_BASE_URL = f"http://127.0.0.1:{port}/bot"
+    bot.ANSWER_MODE = args.answer_mode
+    bot.STORE = bot.QuizStore(os.path.join(tmp, "bench.db"), bot.DB_FLUSH_INTERVAL)
+
+    app = bot.build_app()
+    driver = Driver(app, fake, args.timeout)
+    users = [100_000 + i for i in range(args.users)]
+    groups = [-(1_000_000 + g) for g in range(args.groups)]
+    for g, chat_id in enumerate(groups):
+        fake.admins[chat_id] = 900_000 + g
+
+    report = {"config": vars(args)}
+    async with app:
+        await bot.post_init(app)
+        await app.start()
+
+        # phase 1: private quizzes + हर group में admin का quiz
+        started = time.perf_counter()
+        calls_before = sum(fake.calls.values())
+        quizzes = [driver.run_quiz(u, u) for u in users]
+        quizzes += [driver.run_quiz(fake.admins[c], c) for c in groups]
+        await gather_limited(args.parallel, quizzes)
+        quiz_elapsed = time.perf_counter() - started
+        quiz_calls = sum(fake.calls.values()) - calls_before
+        quiz_updates = sum(len(driver.latency[k]) for k in ("quiz_command", "handle_answer"))
+
+        # phase 2: group members daily सवाल पर tap करते हैं
+        taps = []
+        for chat_id in groups:
+            question = bot.BANK.table[0]
+            message = {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": chat_dict(chat_id),
+                "from": BOT_USER,
+                "text": question.daily_text,
+            }
+            for m in range(args.group_members):
+                data = random.choice(question.markup.inline_keyboard)[0].callback_data
+                taps.append(driver.tap("daily_tap", 500_000 + m, message, data))
+        await asyncio.gather(*taps)
+
+        # phase 3: /leaderboard burst
+        burst = []
+        for i in range(args.leaderboard_burst):
+            chat_id = random.choice(groups) if groups and i % 2 else random.choice(users)
+            user_id = chat_id if chat_id > 0 else 500_000 + i % max(args.group_members, 1)
+            burst.append(driver.command("leaderboard", user_id, chat_id, "/leaderboard"))
+        await asyncio.gather(*burst)
+
+        # सब processed होने तक रुको
+        while driver._inflight:
+            await asyncio.sleep(0.05)
+        total_elapsed = time.perf_counter() - started
+
+        await app.stop()
+    await bot.post_shutdown(app)
+    server.should_exit = True
+    await server_task
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    total_updates = sum(len(v) for v in driver.latency.values())
+    report["handlers"] = {
+        kind: {
+            "count": len(vals),
+            "p50_ms": round(percentile(vals, 50) * 1000, 2),
+            "p95_ms": round(percentile(vals, 95) * 1000, 2),
+            "p99_ms": round(percentile(vals, 99) * 1000, 2),
+            "mean_ms": round(statistics.fmean(vals) * 1000, 2),
+        }
+        for kind, vals in sorted(driver.latency.items())
+    }
+    report["quizzes_completed"] = driver.completed
+    report["quizzes_failed"] = driver.failed
+    report["quiz_updates_per_sec"] = round(quiz_updates / quiz_elapsed, 1)
+    report["updates_per_sec"] = round(total_updates / total_elapsed, 1)
+    report["api_calls_per_quiz"] = round(quiz_calls / max(driver.completed, 1), 2)
+    report["api_calls"] = dict(fake.calls)
+    report["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return report
+
+
+def print_report(report: dict):
+    print(f"{'handler':<16}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for kind, row in report["handlers"].items():
+        print(f"{kind:<16}{row['count']:>8}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}")
+    print()
+    print(f"quizzes completed   : {report['quizzes_completed']} (failed {report['quizzes_failed']})")
+    print(f"updates/sec (quiz)  : {report['quiz_updates_per_sec']}")
+    print(f"updates/sec (total) : {report['updates_per_sec']}")
+    print(f"API calls per quiz  : {report['api_calls_per_quiz']}")
+    print(f"API calls by method : {report['api_calls']}")
+    print(f"peak RSS            : {report['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000, help="private chat में quiz करने वाले users")
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument("--group-members", type=int, default=40, help="हर group में daily tap करने वाले")
+    parser.add_argument("--leaderboard-burst", type=int, default=2000)
+    parser.add_argument("--parallel", type=int, default=100, help="एक साथ चल रहे quizzes")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="fake API का delay (ms)")
+    parser.add_argument("--answer-mode", choices=("compact", "verbose"), default=bot.ANSWER_MODE)
+    parser.add_argument("--timeout", type=float, default=60.0, help="एक सवाल के जवाब का max इंतज़ार (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="PATH", help="report JSON में भी लिखो")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    report = asyncio.run(run_bench(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
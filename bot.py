@@ -1,483 +1,2524 @@
+import asyncio
+import base64
+import bisect
+import csv
+import functools
+import hashlib
+import hmac
+import io
+import json
 import logging
-from datetime import timedelta
+import math
+import os
+import secrets
+import sqlite3
+import tempfile
+import time
+import weakref
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import NamedTuple
 
 from telegram import (
     Update,
     InlineKeyboardMarkup,
     InlineKeyboardButton,
+    InputFile,
+    Poll,
 )
 from telegram.ext import (
     ApplicationBuilder,
+    ApplicationHandlerStop,
+    BaseUpdateProcessor,
     CommandHandler,
     CallbackQueryHandler,
+    ChatMemberHandler,
+    BaseRateLimiter,
     ContextTypes,
+    PollAnswerHandler,
 )
+from telegram.request import HTTPXRequest
+from telegram.error import BadRequest, ChatMigrated, Forbidden, NetworkError, RetryAfter, TimedOut
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+import uvicorn
 
 # ---------- CONFIG ----------
 BOT_TOKEN = "xxxx"   # यहां अपना असली BotFather वाला token डालें
 
-# ---------- QUESTIONS (Mauryan Empire) ----------
-QUESTIONS = [
-    {
-        "question": "1. मौर्य साम्राज्य की स्थापना किसने की?",
-        "options": [
-            "A) बिन्दुसार",
-            "B) चंद्रगुप्त मौर्य",
-            "C) अशोक",
-            "D) पुष्यमित्र शुंग",
-        ],
-        "correct": "B",
-        "explanation": "चंद्रगुप्त मौर्य ने 322 ई.पू. में मौर्य साम्राज्य की स्थापना की।",
-    },
-    {
-        "question": "2. चंद्रगुप्त मौर्य का गुरु कौन था?",
-        "options": [
-            "A) विष्णुगुप्त",
-            "B) चाणक्य",
-            "C) पतंजलि",
-            "D) मेगस्थनीज़",
-        ],
-        "correct": "B",
-        "explanation": "चाणक्य ही कौटिल्य/विष्णुगुप्त हैं, जिन्होंने चंद्रगुप्त को साम्राज्य स्थापित करने में मदद की।",
-    },
-    {
-        "question": "3. मौर्य साम्राज्य की राजधानी थी—",
-        "options": [
-            "A) उज्जैन",
-            "B) तक्षशिला",
-            "C) पाटलिपुत्र",
-            "D) कौशाम्बी",
-        ],
-        "correct": "C",
-        "explanation": "पाटलिपुत्र (आधुनिक पटना) मौर्य साम्राज्य की राजधानी थी।",
-    },
-    {
-        "question": "4. मेगस्थनीज़ किसके दरबार में आया?",
-        "options": [
-            "A) अशोक",
-            "B) बिन्दुसार",
-            "C) चंद्रगुप्त मौर्य",
-            "D) बृहद्रथ",
-        ],
-        "correct": "C",
-        "explanation": "मेगस्थनीज़ सेल्यूकस निकेटर का दूत था और चंद्रगुप्त मौर्य के दरबार में आया।",
-    },
-    {
-        "question": "5. मेगस्थनीज़ की पुस्तक का नाम है—",
-        "options": [
-            "A) मिलिंदपन्हो",
-            "B) इंडिका",
-            "C) कथावत्थु",
-            "D) मुद्राराक्षस",
-        ],
-        "correct": "B",
-        "explanation": "इंडिका में भारत के समाज, प्रशासन और जीवन का विवरण है।",
-    },
-    {
-        "question": "6. चंद्रगुप्त मौर्य ने किस यूनानी शासक को पराजित किया?",
-        "options": [
-            "A) एंटियोकस",
-            "B) सेल्यूकस निकेटर",
-            "C) डेमेट्रियस",
-            "D) मिनेंडर",
-        ],
-        "correct": "B",
-        "explanation": "चंद्रगुप्त ने सेल्यूकस निकेटर को हराकर उसके साथ संधि की और कई प्रदेश प्राप्त किए।",
-    },
-    {
-        "question": "7. अशोक ने किस युद्ध के बाद बौद्ध धर्म अपनाया?",
-        "options": [
-            "A) पाटलिपुत्र युद्ध",
-            "B) राजगृह युद्ध",
-            "C) कौशांबी युद्ध",
-            "D) कलिंग युद्ध",
-        ],
-        "correct": "D",
-        "explanation": "कलिंग युद्ध की भीषण हानि देखकर अशोक हिंसा से विरक्त हुआ और बौद्ध धर्म अपना लिया।",
-    },
-    {
-        "question": "8. कलिंग युद्ध कब हुआ?",
-        "options": [
-            "A) 321 ई.पू.",
-            "B) 273 ई.पू.",
-            "C) 261 ई.पू.",
-            "D) 185 ई.पू.",
-        ],
-        "correct": "C",
-        "explanation": "कलिंग युद्ध 261 ई.पू. में हुआ, यह मौर्य इतिहास की प्रमुख घटना है।",
-    },
-    {
-        "question": "9. अशोक ने किस बौद्ध परिषद का आयोजन करवाया?",
-        "options": [
-            "A) प्रथम",
-            "B) द्वितीय",
-            "C) तृतीय",
-            "D) चतुर्थ",
-        ],
-        "correct": "C",
-        "explanation": "अशोक ने तृतीय बौद्ध परिषद पाटलिपुत्र में आयोजित करवाई।",
-    },
-    {
-        "question": "10. तृतीय बौद्ध परिषद का अध्यक्ष था—",
-        "options": [
-            "A) वसुमित्र",
-            "B) नागसेन",
-            "C) मोग्गलिपुत्त तिस्स",
-            "D) उपगुप्त",
-        ],
-        "correct": "C",
-        "explanation": "तृतीय बौद्ध परिषद की अध्यक्षता मोग्गलिपुत्त तिस्स ने की।",
-    },
-    {
-        "question": "11. अशोक के अधिकांश शिलालेख किस लिपि में हैं?",
-        "options": [
-            "A) देवनागरी",
-            "B) ब्राह्मी",
-            "C) खरोष्ठी",
-            "D) अरेमाइक",
-        ],
-        "correct": "B",
-        "explanation": "अशोक के अधिकतर शिलालेख ब्राह्मी लिपि में हैं, उत्तर-पश्चिम में खरोष्ठी भी।",
-    },
-    {
-        "question": "12. अशोक के शिलालेखों की भाषा मुख्यतः—",
-        "options": [
-            "A) संस्कृत",
-            "B) पाली",
-            "C) प्राकृत",
-            "D) तिब्बती",
-        ],
-        "correct": "C",
-        "explanation": "अधिकांश अभिलेख साधारण लोगों की समझ के लिए प्राकृत भाषा में लिखे गए।",
-    },
-    {
-        "question": "13. अशोक के आध्यात्मिक गुरु थे—",
-        "options": [
-            "A) उपगुप्त",
-            "B) नागार्जुन",
-            "C) आनंद",
-            "D) असंग",
-        ],
-        "correct": "A",
-        "explanation": "परंपरा के अनुसार उपगुप्त को अशोक का आध्यात्मिक गुरु माना जाता है।",
-    },
-    {
-        "question": "14. मौर्य प्रशासन में \"अमत्य\" का अर्थ है—",
-        "options": [
-            "A) सैनिक",
-            "B) जासूस",
-            "C) मंत्री/अधिकारी",
-            "D) कर संग्राहक",
-        ],
-        "correct": "C",
-        "explanation": "अमत्य उच्च प्रशासनिक अधिकारी या मंत्री थे, जो शासन कार्य में सहायक थे।",
-    },
-    {
-        "question": "15. “धम्म” का प्रचार किस मौर्य शासक ने किया?",
-        "options": [
-            "A) बिन्दुसार",
-            "B) अशोक",
-            "C) दशरथ",
-            "D) कुनाल",
-        ],
-        "correct": "B",
-        "explanation": "अशोक ने \"धम्म\" नीति के माध्यम से नैतिक जीवन, सहिष्णुता और अहिंसा का प्रचार किया।",
-    },
-    {
-        "question": "16. मौर्य काल में \"संघ\" का अर्थ है—",
-        "options": [
-            "A) प्रशासनिक विभाग",
-            "B) किसान संघ",
-            "C) व्यापार संगठन",
-            "D) बौद्ध भिक्षुओं का संगठन",
-        ],
-        "correct": "D",
-        "explanation": "संघ से आशय बौद्ध भिक्षुओं के संगठित समुदाय से था।",
-    },
-    {
-        "question": "17. मौर्य काल में प्रमुख कर कौन सा था?",
-        "options": [
-            "A) व्यापार कर",
-            "B) मनोरंजन कर",
-            "C) भू-कर",
-            "D) वन कर",
-        ],
-        "correct": "C",
-        "explanation": "कृषि आधारित अर्थव्यवस्था होने के कारण भूमि कर ही मुख्य राजस्व स्रोत था।",
-    },
-    {
-        "question": "18. अर्थशास्त्र का लेखक कौन है?",
-        "options": [
-            "A) विष्णु शर्मा",
-            "B) कालिदास",
-            "C) चाणक्य",
-            "D) पाणिनि",
-        ],
-        "correct": "C",
-        "explanation": "कौटिल्य/चाणक्य द्वारा रचित अर्थशास्त्र मौर्य प्रशासन का मुख्य ग्रंथ है।",
-    },
-    {
-        "question": "19. किसे अशोक ने श्रीलंका भेजा?",
-        "options": [
-            "A) फाह्यान",
-            "B) ह्वेनसांग",
-            "C) महेंद्र व संघमित्रा",
-            "D) नागार्जुन",
-        ],
-        "correct": "C",
-        "explanation": "अशोक ने अपने पुत्र महेंद्र और पुत्री संघमित्रा को बौद्ध धर्म प्रचार हेतु श्रीलंका भेजा।",
-    },
-    {
-        "question": "20. मौर्य काल का \"धनक\" किससे संबंधित था?",
-        "options": [
-            "A) कृषि",
-            "B) धातु कार्य",
-            "C) व्यापार",
-            "D) चिकित्सा",
-        ],
-        "correct": "B",
-        "explanation": "धनक शब्द का प्रयोग लोहार/धातु कार्य से जुड़े वर्ग के लिए होता था।",
-    },
-    {
-        "question": "21. अशोक के शिलालेखों को सबसे पहले किसने पढ़ा?",
-        "options": [
-            "A) कनिंघम",
-            "B) जेम्स प्रिंसेप",
-            "C) स्मिथ",
-            "D) मार्शल",
-        ],
-        "correct": "B",
-        "explanation": "जेम्स प्रिंसेप ने 1837 ई. में ब्राह्मी लिपि को सफलतापूर्वक पढ़ा।",
-    },
-    {
-        "question": "22. मौर्य साम्राज्य में भूमि मापने वाला अधिकारी—",
-        "options": [
-            "A) लिपिक",
-            "B) नगरिक",
-            "C) संधिविग्रहक",
-            "D) कोषाध्यक्ष",
-        ],
-        "correct": "A",
-        "explanation": "लिपिक भूमि मापन, लेखा व अभिलेख का कार्य करता था।",
-    },
-    {
-        "question": "23. अशोक के अभिलेखों में “राजुक” कौन था?",
-        "options": [
-            "A) न्यायधीश",
-            "B) मंत्री",
-            "C) जिला अधिकारी",
-            "D) दंडाधिकारी",
-        ],
-        "correct": "C",
-        "explanation": "राजुक आधुनिक अर्थों में जिला अधिकारी जैसा पद था जो प्रशासन व न्याय दोनों देखता था।",
-    },
-    {
-        "question": "24. मौर्य साम्राज्य का अंतिम शासक था—",
-        "options": [
-            "A) दशरथ",
-            "B) कुणाल",
-            "C) बृहद्रथ",
-            "D) बिन्दुसार",
-        ],
-        "correct": "C",
-        "explanation": "बृहद्रथ मौर्य अंतिम शासक था, जिसकी हत्या पुष्यमित्र शुंग ने की।",
-    },
-    {
-        "question": "25. मौर्य काल के सिक्के मुख्यतः किस धातु के थे?",
-        "options": [
-            "A) सोना",
-            "B) तांबा",
-            "C) चाँदी",
-            "D) लोहा",
-        ],
-        "correct": "C",
-        "explanation": "मौर्य काल के पंच-चिह्नित (Punch-marked) सिक्के प्रायः चाँदी के होते थे।",
-    },
+# local fake Telegram server से test करना हो तो यहां उसका URL
+TELEGRAM_BASE_URL = "https://api.telegram.org/bot"
+
+# inline buttons के callback data पर HMAC; सारे bot processes में एक ही होना चाहिए
+CALLBACK_SECRET = ""  # खाली = BOT_TOKEN से निकाला जाता है
+
+# Bot API HTTP client; sends और getUpdates के अलग connection pools (long poll sends को न रोके)
+HTTP_POOL_SIZE = 256  # sends pool में max connections
+HTTP_POOL_TIMEOUT = 3.0  # pool भरा हो तो free connection का कितना इंतज़ार (seconds)
+HTTP_KEEPALIVE = 60.0  # idle connection कितनी देर खुला रहे; हर send पर नया TCP/TLS handshake नहीं
+HTTP_READ_TIMEOUT = 10.0
+HTTP_VERSION = "1.1"  # "2" = HTTP/2, एक connection पर कई requests साथ (python-telegram-bot[http2])
+# एक ही chat को साथ-साथ भेजे गए सादे messages (या पिछले send के चलते आए) एक message में जुड़ जाते हैं
+SEND_COALESCE = True
+
+# एक साथ कितने updates process हो सकते हैं (1 = पुराना एक-एक करके)
+# एक ही user के updates फिर भी क्रम से ही चलते हैं (PerUserUpdateProcessor)
+CONCURRENT_UPDATES = 64
+
+# WEBHOOK_URL खाली = polling; भरा हो तो webhook server चलेगा
+WEBHOOK_URL = ""  # जैसे "https://quiz.example.com"
+WEBHOOK_PATH = "/telegram"
+WEBHOOK_LISTEN = "0.0.0.0"
+WEBHOOK_PORT = 8443
+WEBHOOK_SECRET = ""  # Telegram हर request के header में यही भेजेगा; खाली = हर start पर नया random (कई processes हों तो भरें)
+WEBHOOK_MAX_CONNECTIONS = 40  # Telegram की तरफ़ से parallel HTTPS connections
+
+# "compact" = हर tap पर वही message edit (1-2 API calls)
+# "verbose" = पुराना तरीका: feedback, explanation और अगला सवाल अलग-अलग messages में
+ANSWER_MODE = "compact"
+
+# /quiz में हर सवाल की time limit (seconds); 0 = कोई limit नहीं
+# समय खत्म होने पर सवाल गलत माना जाता है और अगला अपने-आप आता है
+QUESTION_TIME_LIMIT = 0
+TIMER_TICK = 0.5  # timer wheel की resolution (seconds)
+TIMER_SLOTS = 512
+TIMER_BATCH = 100  # एक बार में कितने timeouts साथ process हों
+
+# True = daily और group /quiz में Telegram के native quiz polls (Telegram खुद grade करता है)
+POLL_MODE = False
+POLL_OPEN_PERIOD = 30  # group poll quiz में हर सवाल कितने seconds खुला रहे
+
+# /round: group में एक सवाल, तय समय तक सब जवाब दें; नतीजों वाला message debounce होकर edit होता है
+ROUND_SECONDS = 30
+ROUND_EDIT_INTERVAL = 3.0  # seconds; इससे जल्दी edit नहीं
+ROUND_FASTEST = 3  # नतीजों में कितने सबसे तेज़ सही जवाब दिखें
+
+# group admins की list कितनी देर cache रहे (seconds) और कितने chats तक
+ADMIN_CACHE_TTL = 300
+ADMIN_CACHE_MAX_CHATS = 10_000
+
+# leaderboard और चल रहे quiz sessions यहां save होते हैं (restart के बाद भी बचे रहें)
+DB_PATH = "quiz_bot.db"
+DB_FLUSH_INTERVAL = 2.0  # seconds; writes इतनी देर तक batch होते हैं
+
+# हर सवाल/option के जवाबों की गिनती (/stats); DB में इतनी देर पर batch में, /stats भी इसी पर ताज़ा होता है
+STATS_FLUSH_INTERVAL = 30  # seconds
+STATS_HARDEST = 5  # /stats में सबसे कठिन कितने सवाल
+STATS_MIN_ANSWERS = 5  # इससे कम जवाब वाले सवाल "कठिन" list में नहीं
+
+# /export और /reset_board: DB से एक बार में इतनी rows (CSV पूरा memory में नहीं, temp file में बनता है)
+EXPORT_CHUNK_ROWS = 5000
+
+# outbound messages (daily quiz broadcast) की rate limits
+OUTBOX_GLOBAL_RATE = 25  # messages/sec, Telegram की ~30/s limit से थोड़ा नीचे
+OUTBOX_PER_CHAT_INTERVAL = 1.0  # एक chat में दो messages के बीच कम से कम इतने seconds
+OUTBOX_WORKERS = 8
+OUTBOX_MAX_RETRIES = 5
+DAILY_CATCHUP_MINUTES = 60  # daily tick इतने minutes तक छूटे तो बीच के slots भी; इससे बड़ा gap = घड़ी का झटका
+
+# memory में कितने अधूरे quiz sessions रहें; idle sessions TTL के बाद हटते हैं
+SESSION_MAX = 100_000
+SESSION_IDLE_TTL = 6 * 3600  # seconds
+STREAM_CACHE_MAX = 100_000  # memory में कितने (user/chat, topic) के "अगला सवाल" offsets; बाकी DB से
+
+# एक ही सवाल पर दोबारा tap (double-tap) कितनी देर तक याद रखें, और कितने तक
+TAP_DEDUP_TTL = 3600  # seconds
+TAP_DEDUP_MAX = 200_000
+# इतने से ज़्यादा updates process होने के इंतज़ार में हों (backlog) तो CALLBACK_MAX_AGE से पुराने taps सस्ते में निपटाओ
+SHED_QUEUE_DEPTH = 500
+CALLBACK_MAX_AGE = 300  # seconds, सवाल दिखने के समय से
+
+# Prometheus format metrics (/metrics); 0 = बंद
+# दोनों modes में इस port पर अलग server, public webhook port पर कभी नहीं
+METRICS_PORT = 0
+METRICS_LISTEN = "0.0.0.0"  # सिर्फ अंदर से scrape हो तो "127.0.0.1" या internal IP
+
+# सवाल data files से: QUESTIONS_DIR में हर topic की एक .json file, जैसे
+# {"topic": "mauryan", "title": "Mauryan Empire", "questions": [
+#     {"question", "options", "correct", "explanation", "difficulty": "easy|medium|hard", "tags": [...]}]}
+QUESTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions")
+QUESTIONS_RELOAD_INTERVAL = 30  # seconds; files बदलें तो बिना restart नया bank, 0 = बंद
+DEFAULT_TOPIC = "mauryan"  # बिना topic वाला /quiz
+QUIZ_LENGTH = 25  # एक /quiz में कितने सवाल (topic छोटा हो तो उतने ही)
+
+# ---------- CALLBACK DATA (signed, stateless) ----------
+# format: "a.<ver>.<deck>.<start>.<pos>.<sid>.<score>.<sig>.<option>"  (Telegram limit 64 bytes)
+# ver = question bank version, deck = उस bank की कौन सी सूची, start = quiz user के stream में कहां से शुरू हुआ,
+# pos = quiz का कौनसा सवाल (sid 0 = daily/standalone: start ही सीधा qid है)
+# sid = quiz session id, score = इस सवाल से पहले का score
+# sig उस user के लिए बनता है जिसका quiz है, इसलिए कोई और उसका बटन नहीं दबा सकता
+CALLBACK_KEY = hashlib.sha256(
+    (CALLBACK_SECRET or "mcq-callback:" + BOT_TOKEN).encode()
+).digest()
+
+
+def _callback_sig(user_id: int, payload: str) -> str:
+    digest = hmac.new(CALLBACK_KEY, f"{user_id}.{payload}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:9]).decode()
+
+
+def answer_prefix(ver: int, deck: int, start: int, pos: int, user_id: int, sid: int, score: int) -> str:
+    # बस option number जोड़ना बाकी; option खुद sign नहीं होता (user कोई भी चुन सकता है)
+    payload = f"{ver}.{deck}.{start}.{pos}.{sid}.{score}"
+    return f"a.{payload}.{_callback_sig(user_id, payload)}."
+
+
+def parse_answer(data: str, user_id: int):
+    # (ver, deck, start, pos, sid, score, option) या None अगर data पुराना/बदला हुआ/किसी और का है
+    parts = data.split(".")
+    if len(parts) != 9 or parts[0] != "a":
+        return None
+    payload = ".".join(parts[1:7])
+    owner = user_id if parts[5] != "0" else 0
+    if not hmac.compare_digest(parts[7], _callback_sig(owner, payload)):
+        return None
+    try:
+        return tuple(int(p) for p in parts[1:7]) + (int(parts[8]),)
+    except ValueError:
+        return None
+
+
+def new_session_id() -> int:
+    return secrets.randbits(40) or 1
+
+
+# ---------- PRECOMPILED QUESTION TABLE ----------
+# हर bank load पर एक बार बनती है; handlers सिर्फ इसी से पढ़ते हैं
+LETTERS = ("A", "B", "C", "D")
+RIGHT_FEEDBACK = "✅ सही जवाब!"
+
+
+class CompiledQuestion(NamedTuple):
+    key: str  # text + options का hash; analytics इसी से, ताकि reload/क्रम बदलने पर भी वही row
+    text: str
+    daily_text: str
+    options: tuple
+    correct: int
+    wrong_feedback: str
+    explanation_text: str  # खाली string = कोई explanation नहीं
+    right_block: str  # compact mode: सवाल + verdict + explanation
+    wrong_block: str
+    timeout_feedback: str
+    timeout_block: str
+    markup: InlineKeyboardMarkup  # daily/standalone (sid 0, "*" deck) keyboard; quiz वाले session_markup से
+    poll_question: str  # Telegram poll limits के अंदर काटे हुए
+    poll_options: tuple
+    poll_explanation: str
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def _join_blocks(*parts) -> str:
+    return "\n\n".join(p for p in parts if p)
+
+
+def compile_questions(raw_questions, version: int, first_qid: int = 0) -> tuple:
+    table = []
+    for n, q in enumerate(raw_questions, start=1):
+        text = q.get("question")
+        options = tuple(q.get("options") or ())
+        if not text:
+            raise ValueError(f"question #{n}: 'question' खाली है")
+        if not 2 <= len(options) <= len(LETTERS):
+            raise ValueError(
+                f"question #{n}: options 2 से {len(LETTERS)} के बीच होने चाहिए"
+            )
+
+        correct_letter = str(q.get("correct", "")).upper().strip()
+        if correct_letter not in LETTERS[: len(options)]:
+            raise ValueError(f"question #{n}: गलत 'correct' = {q.get('correct')!r}")
+        correct = LETTERS.index(correct_letter)
+
+        explanation = q.get("explanation")
+        explanation_text = f"ℹ️ व्याख्या:\n{explanation}" if explanation else ""
+        wrong_feedback = f"❌ गलत.\nसही जवाब: {options[correct]}"
+        timeout_feedback = f"⏰ समय समाप्त!\nसही जवाब: {options[correct]}"
+        prefix = answer_prefix(version, 0, first_qid + n - 1, 0, 0, 0, 0)
+        markup = InlineKeyboardMarkup(
+            [
+                [InlineKeyboardButton(text=opt, callback_data=f"{prefix}{i}")]
+                for i, opt in enumerate(options)
+            ]
+        )
+        table.append(
+            CompiledQuestion(
+                key=hashlib.blake2b("\0".join((text,) + options).encode(), digest_size=8).hexdigest(),
+                text=text,
+                daily_text="📅 Daily Quiz:\n" + text,
+                options=options,
+                correct=correct,
+                wrong_feedback=wrong_feedback,
+                explanation_text=explanation_text,
+                right_block=_join_blocks(text, RIGHT_FEEDBACK, explanation_text),
+                wrong_block=_join_blocks(text, wrong_feedback, explanation_text),
+                timeout_feedback=timeout_feedback,
+                timeout_block=_join_blocks(text, timeout_feedback, explanation_text),
+                markup=markup,
+                poll_question=_clip(text, 300),
+                poll_options=tuple(_clip(opt, 100) for opt in options),
+                poll_explanation=_clip(explanation, 200) if explanation else "",
+            )
+        )
+    return tuple(table)
+
+
+# ---------- QUESTION BANK (data files, versioned) ----------
+DIFFICULTIES = ("easy", "medium", "hard")
+ALL_DECK = "*"  # deck 0: bank के सारे सवाल, file क्रम में
+
+
+class QuestionBank:
+    # load के बाद कभी नहीं बदलता; reload = नया object, चल रहे quiz अपने पुराने object पर ही रहते हैं
+    # decks: topic ("mauryan"), tag ("#ashoka") और "<key>/<difficulty>" -> qids, ताकि चुनना एक dict lookup हो
+    __slots__ = ("version", "table", "titles", "deck_ids", "deck_names", "decks", "__weakref__")
+
+    def __init__(self, version: int, table: tuple, titles: dict, decks: dict):
+        self.version = version
+        self.table = table
+        self.titles = titles  # topic -> title
+        self.deck_ids = {name: i for i, name in enumerate(decks)}
+        self.deck_names = tuple(decks)
+        self.decks = tuple(decks.values())
+
+    def find(self, name: str, difficulty: str = None):
+        # पहले topic, फिर tag; None = ऐसा कोई deck नहीं
+        for key in (name.lower(), "#" + name.lower()):
+            if difficulty:
+                key = f"{key}/{difficulty.lower()}"
+            deck = self.deck_ids.get(key)
+            if deck is not None:
+                return deck
+        return None
+
+    def quiz_length(self, deck: int) -> int:
+        return min(QUIZ_LENGTH, len(self.decks[deck]))
+
+
+def load_bank(directory: str) -> QuestionBank:
+    blobs = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".json"):
+            with open(os.path.join(directory, name), "rb") as f:
+                blobs.append((name, f.read()))
+    # version content से बनता है: restart के बाद भी वही files = वही version, पुराने बटन चलते रहें
+    version = zlib.crc32(b"".join(name.encode() + b"\0" + blob for name, blob in blobs)) & 0xFFFFF or 1
+
+    table, titles = [], {}
+    decks = {ALL_DECK: []}
+    for name, blob in blobs:
+        data = json.loads(blob)
+        topic = str(data.get("topic") or name[: -len(".json")]).lower()
+        if topic in titles:
+            raise ValueError(f"{name}: topic {topic!r} दो files में है")
+        titles[topic] = data.get("title") or topic
+        raw = data.get("questions") or []
+        try:
+            compiled = compile_questions(raw, version, len(table))
+        except ValueError as exc:
+            raise ValueError(f"{name}: {exc}") from None
+
+        for n, q in enumerate(raw, start=1):
+            difficulty = q.get("difficulty")
+            if difficulty is not None and difficulty not in DIFFICULTIES:
+                raise ValueError(f"{name}: question #{n}: गलत 'difficulty' = {difficulty!r}")
+            tags = q.get("tags") or []
+            if not isinstance(tags, list):
+                raise ValueError(f"{name}: question #{n}: 'tags' list होनी चाहिए")
+            qid = len(table) + n - 1
+            decks[ALL_DECK].append(qid)
+            for key in [topic] + ["#" + str(tag).lower() for tag in tags]:
+                decks.setdefault(key, []).append(qid)
+                if difficulty:
+                    decks.setdefault(f"{key}/{difficulty}", []).append(qid)
+        table.extend(compiled)
+
+    if not table:
+        raise ValueError(f"{directory}: कोई सवाल नहीं मिला")
+    return QuestionBank(version, tuple(table), titles, {k: tuple(v) for k, v in decks.items()})
+
+
+def _questions_stamp(directory: str) -> tuple:
+    # reload check के लिए सिर्फ stat(), files पढ़ना तभी जब कुछ बदला हो
+    return tuple(
+        sorted(
+            (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+            for entry in os.scandir(directory)
+            if entry.name.endswith(".json")
+        )
+    )
+
+
+_bank_stamp = _questions_stamp(QUESTIONS_DIR)
+BANK = load_bank(QUESTIONS_DIR)
+# version -> bank; पुराना bank तब तक ज़िंदा जब तक कोई session उसे पकड़े हुए है
+BANKS = weakref.WeakValueDictionary({BANK.version: BANK})
+# daily / evicted sessions के बटनों के लिए पिछले कुछ versions पक्के तौर पर रखो
+_RECENT_BANKS = deque([BANK], maxlen=3)
+
+
+def install_bank(bank: QuestionBank):
+    global BANK
+    BANKS[bank.version] = bank
+    _RECENT_BANKS.append(bank)
+    ANALYTICS.register(bank)
+    BANK = bank  # एक assignment: नए quiz नया bank देखते हैं, चल रहे quiz पर कोई असर नहीं
+
+
+# ---------- QUESTION ORDER (keyed permutation, no "seen" sets) ----------
+# हर owner (user या chat) + deck का एक stream: offset k -> सवाल permute(k) ; state बस अगला offset
+# deck के सारे सवाल एक बार आने के बाद (epoch) नया seed, यानी नया क्रम
+_M64 = (1 << 64) - 1
+
+
+def _mix64(x: int) -> int:
+    # splitmix64 finalizer
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & _M64
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EB & _M64
+    return x ^ (x >> 31)
+
+
+def permute(i: int, n: int, seed: int) -> int:
+    # [0, n) पर keyed bijection: 4-round Feistel + cycle walking (format-preserving shuffle)
+    half = max(1, ((n - 1).bit_length() + 1) // 2)
+    mask = (1 << half) - 1
+    x = i
+    while True:
+        left, right = x >> half, x & mask
+        for r in range(4):
+            left, right = right, left ^ (_mix64(seed ^ (r << 60) ^ right) & mask)
+        x = (left << half) | right
+        if x < n:
+            return x
+
+
+def _stream_seed(owner_id: int, deck_name: str, epoch: int) -> int:
+    # CALLBACK_KEY से keyed, ताकि users अगला सवाल पहले से न निकाल सकें
+    digest = hashlib.blake2b(f"{owner_id}.{deck_name}.{epoch}".encode(), key=CALLBACK_KEY, digest_size=8)
+    return int.from_bytes(digest.digest(), "big")
+
+
+def stream_question(bank: QuestionBank, deck: int, owner_id: int, offset: int) -> CompiledQuestion:
+    qids = bank.decks[deck]
+    epoch, i = divmod(offset, len(qids))
+    return bank.table[qids[permute(i, len(qids), _stream_seed(owner_id, bank.deck_names[deck], epoch))]]
+
+
+class StreamCache:
+    # (owner_id, deck name) -> अगला offset; LRU cap, miss पर DB से (करोड़ों casual users भी memory में नहीं)
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._offsets = OrderedDict()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    async def prefetch(self, keys):
+        # जो memory में नहीं उन्हें एक साथ DB से (daily job में सैकड़ों chats एक बार में)
+        missing = [key for key in keys if key not in self._offsets]
+        if missing:
+            found = await STORE.find_streams(missing)
+            for key in missing:
+                if key not in self._offsets:  # await के दौरान किसी और ने भर दिया हो तो वही सही
+                    self._put(key, found.get(key, 0))
+
+    def take(self, key, n: int, count: int) -> int:
+        # prefetch के बाद, बिना await: पढ़ना और आगे बढ़ाना एक साथ
+        start = self._offsets.get(key, 0)
+        # quiz दो epochs में न बंटे: नए epoch का क्रम पिछले के सवाल फिर चुन सकता है, तो अगली epoch से शुरू
+        if start % n + count > n:
+            start += n - start % n
+        self._put(key, start + count)
+        STORE.save_stream(key[0], key[1], start + count)
+        return start
+
+    def _put(self, key, offset: int):
+        self._offsets[key] = offset
+        self._offsets.move_to_end(key)
+        while len(self._offsets) > self.max_keys:
+            self._offsets.popitem(last=False)  # offset pending write या DB में है, अगली बार वहीं से
+
+
+STREAMS = StreamCache(STREAM_CACHE_MAX)
+
+
+async def take_questions(owner_id: int, bank: QuestionBank, deck: int, count: int) -> int:
+    # stream से अगले `count` सवाल reserve; पहला offset लौटता है (अधूरा छोड़ा quiz भी दोबारा नहीं आता)
+    key = (owner_id, bank.deck_names[deck])
+    await STREAMS.prefetch([key])
+    return STREAMS.take(key, len(bank.decks[deck]), count)
+
+
+def session_question(session, user_id: int) -> CompiledQuestion:
+    return stream_question(session.bank, session.deck, user_id, session.start + session.q_index)
+
+
+def session_markup(session, user_id: int, question: CompiledQuestion) -> InlineKeyboardMarkup:
+    prefix = answer_prefix(
+        session.bank.version, session.deck, session.start, session.q_index, user_id, session.sid, session.score
+    )
+    return InlineKeyboardMarkup(
+        [
+            [InlineKeyboardButton(text=opt, callback_data=f"{prefix}{i}")]
+            for i, opt in enumerate(question.options)
+        ]
+    )
+
+
+# ---------- LOGGING ----------
+logging.basicConfig(
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    level=logging.INFO,
+)
+logger = logging.getLogger(__name__)
+
+
+# ---------- METRICS (Prometheus text format) ----------
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(label_name: str, value) -> str:
+    return f'{label_name}="{value}"'
+
+
+class Counter:
+    __slots__ = ("name", "help", "label", "values")
+
+    def __init__(self, name: str, help_text: str, label: str):
+        self.name, self.help, self.label = name, help_text, label
+        self.values = {}
+
+    def inc(self, key, amount: int = 1):
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in self.values.items():
+            lines.append(f"{self.name}{{{_labels(self.label, key)}}} {value}")
+        return lines
+
+
+class Histogram:
+    # हर label की series = [bucket counts..., sum, count]; observe सिर्फ bisect + 3 additions
+    __slots__ = ("name", "help", "label", "buckets", "series")
+
+    def __init__(self, name: str, help_text: str, label: str, buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label = name, help_text, label
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, key, value: float):
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in self.series.items():
+            label = _labels(self.label, key)
+            running = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                running += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {running}')
+            lines.append(f"{self.name}_sum{{{label}}} {series[-2]}")
+            lines.append(f"{self.name}_count{{{label}}} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    # value scrape के समय ही निकाली जाती है; label हो तो read() एक dict देता है
+    __slots__ = ("name", "help", "read", "label")
+
+    def __init__(self, name: str, help_text: str, read, label: str = None):
+        self.name, self.help, self.read, self.label = name, help_text, read, label
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        if self.label is None:
+            lines.append(f"{self.name} {self.read()}")
+        else:
+            for key, value in self.read().items():
+                lines.append(f"{self.name}{{{_labels(self.label, key)}}} {value}")
+        return lines
+
+
+HANDLER_LATENCY = Histogram("quiz_handler_seconds", "Handler latency", "handler")
+HANDLER_ERRORS = Counter("quiz_handler_errors_total", "Handler exceptions", "handler")
+API_LATENCY = Histogram("telegram_api_seconds", "Bot API call latency (count = calls)", "method")
+API_ERRORS = Counter("telegram_api_errors_total", "Bot API errors and network failures", "method")
+API_RETRY_AFTER = Counter("telegram_api_retry_after_total", "Bot API 429 RetryAfter responses", "method")
+HTTP_POOL_SATURATED = Counter(
+    "telegram_http_pool_saturated_total", "Requests started while every pool connection was busy", "pool"
+)
+HTTP_POOL_TIMEOUTS = Counter(
+    "telegram_http_pool_timeouts_total", "Requests dropped after waiting HTTP_POOL_TIMEOUT for a connection", "pool"
+)
+SENDS_COALESCED = Counter("telegram_sends_coalesced_total", "Messages merged into an earlier send", "method")
+METRICS = [
+    HANDLER_LATENCY,
+    HANDLER_ERRORS,
+    API_LATENCY,
+    API_ERRORS,
+    API_RETRY_AFTER,
+    HTTP_POOL_SATURATED,
+    HTTP_POOL_TIMEOUTS,
+    SENDS_COALESCED,
 ]
 
 
-# ---------- LOGGING ----------
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-)
-logger = logging.getLogger(__name__)
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def instrumented(name: str):
+    # handler/job की latency और exceptions गिनो
+    def wrap(fn):
+        @functools.wraps(fn)
+        async def inner(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except Exception:
+                HANDLER_ERRORS.inc(name)
+                raise
+            finally:
+                HANDLER_LATENCY.observe(name, time.perf_counter() - started)
+
+        return inner
+
+    return wrap
+
+
+HTTP_POOLS = {}  # pool name -> InstrumentedRequest
+
+
+class InstrumentedRequest(HTTPXRequest):
+    # हर Bot API call: method के हिसाब से latency, errors और 429; pool के हिसाब से in-flight और saturation
+    def __init__(self, pool: str, connection_pool_size: int, **kwargs):
+        limits = httpx.Limits(
+            max_connections=connection_pool_size,
+            max_keepalive_connections=connection_pool_size,
+            keepalive_expiry=HTTP_KEEPALIVE,
+        )
+        super().__init__(
+            connection_pool_size=connection_pool_size,
+            pool_timeout=HTTP_POOL_TIMEOUT,
+            http_version=HTTP_VERSION,
+            httpx_kwargs={"limits": limits},
+            **kwargs,
+        )
+        self.pool = pool
+        self.pool_size = connection_pool_size
+        self.in_flight = 0
+        HTTP_POOLS[pool] = self
+
+    async def do_request(self, url, *args, **kwargs):
+        endpoint = url.rsplit("/", 1)[-1]
+        if self.in_flight >= self.pool_size:
+            # यह request free connection का इंतज़ार करेगी (HTTP/2 में एक connection कई requests ले लेता है)
+            HTTP_POOL_SATURATED.inc(self.pool)
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, *args, **kwargs)
+        except Exception as exc:
+            API_ERRORS.inc(endpoint)
+            if isinstance(exc, TimedOut) and exc.message.startswith("Pool timeout"):
+                HTTP_POOL_TIMEOUTS.inc(self.pool)
+            raise
+        finally:
+            self.in_flight -= 1
+            API_LATENCY.observe(endpoint, time.perf_counter() - started)
+        if code == 429:
+            API_RETRY_AFTER.inc(endpoint)
+        elif code >= 400:
+            API_ERRORS.inc(endpoint)
+        return code, payload
+
+
+class _SendBatch:
+    __slots__ = ("shape", "data", "texts", "size", "result")
+
+    def __init__(self, shape, data: dict):
+        self.shape = shape
+        self.data = data
+        self.texts = [data["text"]]
+        self.size = len(data["text"])
+        self.result = asyncio.get_running_loop().create_future()
+
+
+class SendCoalescer(BaseRateLimiter):
+    # PTB हर Bot API call इसी से निकालता है; एक chat के साथ-साथ आए sendMessage एक call में, सबको वही Message।
+    # कोई timer नहीं: उस chat का पिछला send चल रहा हो तो नया उसके पूरा होने तक रुकता है (बीच में आए texts जुड़ते हैं),
+    # वरना बस एक loop tick, ताकि उसी पल (gather से) शुरू हुए sends जुड़ जाएं; अकेला send देर से नहीं जाता।
+    # keyboard (reply_markup) सिर्फ आखिरी text पर हो सकता है; keyboard आते ही batch बंद।
+    MAX_TEXT = 4096
+
+    def __init__(self):
+        self._open = {}  # chat_id -> अभी न भेजा गया _SendBatch (इसमें और texts जुड़ सकते हैं)
+        self._last = {}  # chat_id -> उस chat का आखिरी batch; अगला इसके बाद ही जाता है (क्रम न बदले)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        if endpoint != "sendMessage" or "entities" in data or not isinstance(data.get("text"), str):
+            return await callback(*args, **kwargs)
+
+        chat_id = data.get("chat_id")
+        shape = tuple(sorted((k, repr(v)) for k, v in data.items() if k not in ("text", "reply_markup")))
+        batch = self._open.pop(chat_id, None)
+        if batch is not None:
+            if batch.shape == shape and batch.size + 2 + len(data["text"]) <= self.MAX_TEXT:
+                batch.texts.append(data["text"])
+                batch.size += 2 + len(data["text"])
+                if data.get("reply_markup") is not None:
+                    batch.data = data
+                else:
+                    self._open[chat_id] = batch
+                SENDS_COALESCED.inc(endpoint)
+                return await batch.result
+            # अलग तरह का message: पुराना batch बंद (अपनी बारी पर जाएगा), यह नया शुरू करे
+
+        prev = self._last.get(chat_id)
+        batch = self._last[chat_id] = _SendBatch(shape, data)
+        if data.get("reply_markup") is None:
+            self._open[chat_id] = batch
+        try:
+            if prev is not None and not prev.result.done():
+                await asyncio.wait([prev.result])
+            else:
+                await asyncio.sleep(0)
+            if self._open.get(chat_id) is batch:
+                del self._open[chat_id]
+            result = await callback(args[0], dict(batch.data, text="\n\n".join(batch.texts)), **kwargs)
+        except BaseException as exc:
+            if self._open.get(chat_id) is batch:
+                del self._open[chat_id]
+            if isinstance(exc, Exception):
+                batch.result.set_exception(exc)
+                batch.result.exception()  # कोई joiner न हो तो "never retrieved" warning न आए
+            else:
+                batch.result.cancel()
+            raise
+        else:
+            batch.result.set_result(result)
+            return result
+        finally:
+            if self._last.get(chat_id) is batch:
+                del self._last[chat_id]
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+# ---------- LEADERBOARD (per chat, incremental) ----------
+LEADERBOARD_SIZE = 10
+
+
+QUIZ_BOARD_TITLE = "🏆 *Leaderboard* (best /quiz score)"
+POINTS_BOARD_TITLE = "⭐ *Points* (rounds + daily)"
+
+
+class ChatBoard:
+    # entries: user_id -> {"score", "name"} (पुराना dict वाला format)
+    # buckets: score -> users (पहले पहुंचने वाला पहले), tree: हर score पर कितने users (Fenwick)
+    # quiz board में best score; points board में कुल points (सिर्फ बढ़ते हैं, तो वही submit चलता है)
+    __slots__ = ("title", "entries", "buckets", "tree", "_top_ids", "_top_text")
+
+    def __init__(self, max_score: int = 32, title: str = QUIZ_BOARD_TITLE):
+        self.title = title
+        self.entries = {}
+        self.buckets = {}
+        self.tree = [0] * (max_score + 2)
+        self._top_ids = None
+        self._top_text = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _tree_add(self, score: int, delta: int):
+        i = score + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def _count_upto(self, score: int) -> int:
+        i = min(score + 1, len(self.tree) - 1)
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def _grow(self, max_score: int):
+        self.tree = [0] * (max(max_score, 2 * (len(self.tree) - 2)) + 2)
+        for score, users in self.buckets.items():
+            self._tree_add(score, len(users))
+
+    def submit(self, user_id: int, name: str, score: int) -> bool:
+        # सिर्फ best score रखा जाता है; True = board बदला
+        prev = self.entries.get(user_id)
+        if prev is not None and score <= prev["score"]:
+            return False
+
+        if score + 2 > len(self.tree):
+            self._grow(score)
+        if prev is not None:
+            old = prev["score"]
+            del self.buckets[old][user_id]
+            if not self.buckets[old]:
+                del self.buckets[old]
+            self._tree_add(old, -1)
+        self.entries[user_id] = {"score": score, "name": name}
+        self.buckets.setdefault(score, {})[user_id] = None
+        self._tree_add(score, 1)
+
+        # top-10 बदला हो तभी rendered text फेंको
+        top = self._top_ids
+        if top is not None and (
+            len(top) < LEADERBOARD_SIZE
+            or user_id in top
+            or score > self.entries[top[-1]]["score"]
+        ):
+            self._top_ids = self._top_text = None
+        return True
+
+    def rank(self, user_id: int):
+        # (rank, total) या None; बराबर score वालों की rank एक ही
+        entry = self.entries.get(user_id)
+        if entry is None:
+            return None
+        total = len(self.entries)
+        return total - self._count_upto(entry["score"]) + 1, total
+
+    def top_ids(self) -> list:
+        if self._top_ids is None:
+            ids = []
+            for score in sorted(self.buckets, reverse=True):
+                for user_id in self.buckets[score]:
+                    ids.append(user_id)
+                    if len(ids) == LEADERBOARD_SIZE:
+                        break
+                if len(ids) == LEADERBOARD_SIZE:
+                    break
+            self._top_ids = ids
+        return self._top_ids
+
+    def top_text(self) -> str:
+        if self._top_text is None:
+            lines = [self.title]
+            for rank, user_id in enumerate(self.top_ids(), start=1):
+                data = self.entries[user_id]
+                lines.append(f"{rank}. {data['name']} — {data['score']}")
+            self._top_text = "\n".join(lines)
+        return self._top_text
+
+
+# ---------- STORAGE (SQLite, write-behind) ----------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leaderboard (
+    chat_id    INTEGER NOT NULL,
+    user_id    INTEGER NOT NULL,
+    name       TEXT    NOT NULL,
+    score      INTEGER NOT NULL,
+    updated_at REAL    NOT NULL,
+    PRIMARY KEY (chat_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS leaderboard_top ON leaderboard (chat_id, score DESC);
+CREATE TABLE IF NOT EXISTS points (
+    chat_id    INTEGER NOT NULL,
+    user_id    INTEGER NOT NULL,
+    name       TEXT    NOT NULL,
+    points     INTEGER NOT NULL,
+    updated_at REAL    NOT NULL,
+    PRIMARY KEY (chat_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS daily_subs (
+    chat_id INTEGER PRIMARY KEY,
+    slot    INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS streams (
+    owner_id INTEGER NOT NULL,
+    deck     TEXT    NOT NULL,
+    next     INTEGER NOT NULL,
+    PRIMARY KEY (owner_id, deck)
+);
+CREATE TABLE IF NOT EXISTS question_stats (
+    question_key TEXT PRIMARY KEY,
+    opt_a        INTEGER NOT NULL,
+    opt_b        INTEGER NOT NULL,
+    opt_c        INTEGER NOT NULL,
+    opt_d        INTEGER NOT NULL,
+    timeouts     INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id    INTEGER PRIMARY KEY,
+    sid        INTEGER NOT NULL DEFAULT 0,
+    q_index    INTEGER NOT NULL,  -- QUIZ_FINISHED = वह quiz पूरा हो चुका
+    score      INTEGER NOT NULL,
+    updated_at REAL    NOT NULL
+);
+"""
+
+
+class QuizStore:
+    # handlers सिर्फ pending dicts में लिखते हैं; disk I/O एक अलग thread पर batch में होता है
+    def __init__(self, path: str, flush_interval: float):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="quiz-db")
+        self._conn = None
+        self._pending_scores = {}  # (chat_id, user_id) -> (name, score)
+        self._pending_points = {}  # (chat_id, user_id) -> (name, कुल points)
+        self._pending_sessions = {}  # user_id -> (sid, q_index, score) या None = delete
+        self._pending_subs = {}  # chat_id -> slot या None = delete
+        self._pending_streams = {}  # (owner_id, deck) -> अगला offset
+        self._pending_stats = {}  # question key -> counts (delta, DB में जुड़ते हैं)
+        self._flusher = None
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    # ---- event loop side (non-blocking) ----
+    def save_score(self, chat_id: int, user_id: int, name: str, score: int):
+        self._pending_scores[(chat_id, user_id)] = (name, score)
+
+    def save_points(self, chat_id: int, user_id: int, name: str, points: int):
+        self._pending_points[(chat_id, user_id)] = (name, points)
+
+    def save_session(self, user_id: int, sid: int, q_index: int, score: int):
+        self._pending_sessions[user_id] = (sid, q_index, score)
+
+    def drop_session(self, user_id: int):
+        self._pending_sessions[user_id] = None
+
+    def save_subscription(self, chat_id: int, slot: int):
+        self._pending_subs[chat_id] = slot
+
+    def drop_subscription(self, chat_id: int):
+        self._pending_subs[chat_id] = None
+
+    def save_stream(self, owner_id: int, deck: str, offset: int):
+        self._pending_streams[(owner_id, deck)] = offset
+
+    def add_question_stats(self, deltas: dict):
+        for key, counts in deltas.items():
+            prev = self._pending_stats.get(key)
+            self._pending_stats[key] = counts if prev is None else tuple(map(sum, zip(prev, counts)))
+
+    async def open(self):
+        await self._run(self._open_sync)
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def load_leaderboard(self, table: str = "leaderboard", title: str = QUIZ_BOARD_TITLE) -> dict:
+        column = "points" if table == "points" else "score"
+        rows = await self._run(
+            self._fetch_sync,
+            f"SELECT chat_id, user_id, name, {column} FROM {table} ORDER BY chat_id, {column} DESC",
+        )
+        boards = {}
+        for chat_id, user_id, name, score in rows:
+            board = boards.get(chat_id)
+            if board is None:
+                board = boards[chat_id] = ChatBoard(title=title)
+            board.submit(user_id, name, score)
+        return boards
+
+    async def load_sessions(self, max_age: float, limit: int) -> dict:
+        # पुराने sessions DB से भी हटाओ; बाकी अधूरे में से सबसे ताज़ा `limit`, पुराने पहले
+        cutoff = time.time() - max_age
+        rows = await self._run(self._load_sessions_sync, cutoff, limit)
+        return {user_id: (sid, q_index, score) for user_id, sid, q_index, score in reversed(rows)}
+
+    async def find_session(self, user_id: int, max_age: float):
+        # memory में न मिले (evict/restart) तो: (sid, q_index, score) या None; pending write सबसे ताज़ा है
+        if user_id in self._pending_sessions:
+            return self._pending_sessions[user_id]
+        rows = await self._run(
+            self._fetch_sync,
+            "SELECT sid, q_index, score FROM sessions WHERE user_id = ? AND updated_at > ?",
+            (user_id, time.time() - max_age),
+        )
+        return rows[0] if rows else None
+
+    async def load_subscriptions(self) -> dict:
+        rows = await self._run(self._fetch_sync, "SELECT chat_id, slot FROM daily_subs")
+        return dict(rows)
+
+    async def load_question_stats(self) -> dict:
+        rows = await self._run(
+            self._fetch_sync,
+            "SELECT question_key, opt_a, opt_b, opt_c, opt_d, timeouts FROM question_stats",
+        )
+        return {row[0]: row[1:] for row in rows}
+
+    async def export_leaderboard(self, chat_id: int, out) -> int:
+        # अपने connection से अलग thread पर (WAL: flushes साथ-साथ चलते रहते हैं); rows chunks में `out` में
+        return await asyncio.to_thread(self._export_sync, chat_id, out)
+
+    async def reset_board(self, chat_id: int) -> int:
+        for pending in (self._pending_scores, self._pending_points):
+            for key in [key for key in pending if key[0] == chat_id]:
+                del pending[key]
+        # cutoff DB thread पर: इससे पहले queue हुए सारे writes हो चुके, बाद वाले नए season के हैं
+        cutoff = await self._run(time.time)
+        deleted = 0
+        for table in ("leaderboard", "points"):
+            while True:
+                # chunks में, ताकि बीच-बीच में बाकी chats के flushes भी चलते रहें
+                count = await self._run(self._delete_board_chunk_sync, table, chat_id, cutoff)
+                deleted += count
+                if count < EXPORT_CHUNK_ROWS:
+                    break
+        return deleted
+
+    async def find_streams(self, keys: list) -> dict:
+        # (owner_id, deck) -> offset, जो मिले; pending writes DB से ताज़ा हैं
+        found = {key: self._pending_streams[key] for key in keys if key in self._pending_streams}
+        rest = [key for key in keys if key not in found]
+        if rest:
+            found.update(await self._run(self._find_streams_sync, rest))
+        return found
+
+    async def flush(self):
+        if not (
+            self._pending_scores
+            or self._pending_points
+            or self._pending_sessions
+            or self._pending_subs
+            or self._pending_streams
+            or self._pending_stats
+        ):
+            return
+        # swap करके लिखो ताकि flush के दौरान आए writes अगले batch में जाएं
+        scores, self._pending_scores = self._pending_scores, {}
+        points, self._pending_points = self._pending_points, {}
+        sessions, self._pending_sessions = self._pending_sessions, {}
+        subs, self._pending_subs = self._pending_subs, {}
+        streams, self._pending_streams = self._pending_streams, {}
+        stats, self._pending_stats = self._pending_stats, {}
+        try:
+            await self._run(self._write_sync, scores, points, sessions, subs, streams, stats)
+        except Exception:
+            logger.exception(
+                "DB flush failed; %d writes अगली बार दोबारा",
+                len(scores) + len(points) + len(sessions) + len(subs) + len(streams) + len(stats),
+            )
+            # जो इस बीच नया आया वो पुराने से ज़्यादा ताज़ा है
+            self._pending_scores = {**scores, **self._pending_scores}
+            self._pending_points = {**points, **self._pending_points}
+            self._pending_sessions = {**sessions, **self._pending_sessions}
+            self._pending_subs = {**subs, **self._pending_subs}
+            self._pending_streams = {**streams, **self._pending_streams}
+            # stats deltas हैं: override नहीं, जोड़ो
+            self.add_question_stats(stats)
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        await self._run(self._close_sync)
+        self._executor.shutdown(wait=True)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    # ---- DB thread side ----
+    def _open_sync(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        # sid column से पहले वाली DB: पुरानी rows sid 0 पर
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        if "sid" not in columns:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN sid INTEGER NOT NULL DEFAULT 0")
+
+    def _fetch_sync(self, sql: str, params=()):
+        return self._conn.execute(sql, params).fetchall()
+
+    def _find_streams_sync(self, keys: list) -> dict:
+        wanted = set(keys)
+        owners = sorted({owner for owner, _ in keys})
+        found = {}
+        for i in range(0, len(owners), 500):
+            chunk = owners[i : i + 500]
+            rows = self._conn.execute(
+                f"SELECT owner_id, deck, next FROM streams WHERE owner_id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for owner, deck, offset in rows:
+                if (owner, deck) in wanted:
+                    found[(owner, deck)] = offset
+        return found
+
+    def _load_sessions_sync(self, cutoff: float, limit: int):
+        with self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE updated_at <= ?", (cutoff,))
+        return self._conn.execute(
+            "SELECT user_id, sid, q_index, score FROM sessions WHERE q_index >= 0 "
+            "ORDER BY updated_at DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+
+    def _write_sync(self, scores: dict, points: dict, sessions: dict, subs: dict, streams: dict, stats: dict):
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO leaderboard (chat_id, user_id, name, score, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (chat_id, user_id) DO UPDATE SET "
+                "name = excluded.name, score = excluded.score, updated_at = excluded.updated_at",
+                [(c, u, name, score, now) for (c, u), (name, score) in scores.items()],
+            )
+            self._conn.executemany(
+                "INSERT INTO points (chat_id, user_id, name, points, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (chat_id, user_id) DO UPDATE SET "
+                "name = excluded.name, points = excluded.points, updated_at = excluded.updated_at",
+                [(c, u, name, total, now) for (c, u), (name, total) in points.items()],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sessions (user_id, sid, q_index, score, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(u, s[0], s[1], s[2], now) for u, s in sessions.items() if s is not None],
+            )
+            self._conn.executemany(
+                "DELETE FROM sessions WHERE user_id = ?",
+                [(u,) for u, s in sessions.items() if s is None],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO daily_subs (chat_id, slot) VALUES (?, ?)",
+                [(c, slot) for c, slot in subs.items() if slot is not None],
+            )
+            self._conn.executemany(
+                "DELETE FROM daily_subs WHERE chat_id = ?",
+                [(c,) for c, slot in subs.items() if slot is None],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO streams (owner_id, deck, next) VALUES (?, ?, ?)",
+                [(owner, deck, offset) for (owner, deck), offset in streams.items()],
+            )
+            self._conn.executemany(
+                "INSERT INTO question_stats (question_key, opt_a, opt_b, opt_c, opt_d, timeouts) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (question_key) DO UPDATE SET "
+                "opt_a = opt_a + excluded.opt_a, opt_b = opt_b + excluded.opt_b, "
+                "opt_c = opt_c + excluded.opt_c, opt_d = opt_d + excluded.opt_d, "
+                "timeouts = timeouts + excluded.timeouts",
+                [(key,) + tuple(counts) for key, counts in stats.items()],
+            )
+
+    def _export_sync(self, chat_id: int, out) -> int:
+        conn = sqlite3.connect(self.path)
+        text = io.TextIOWrapper(out, encoding="utf-8-sig", newline="")  # BOM: Excel में हिंदी नाम ठीक दिखें
+        try:
+            # leaderboard_top index के क्रम में, बिना पूरा board sort/load किए
+            cursor = conn.execute(
+                "SELECT user_id, name, score, updated_at FROM leaderboard "
+                "WHERE chat_id = ? ORDER BY score DESC",
+                (chat_id,),
+            )
+            writer = csv.writer(text)
+            writer.writerow(("rank", "user_id", "name", "score", "updated_at"))
+            count = rank = 0
+            prev = None
+            while True:
+                rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+                if not rows:
+                    return count
+                chunk = []
+                for user_id, name, score, updated_at in rows:
+                    count += 1
+                    if score != prev:
+                        rank, prev = count, score
+                    stamp = datetime.fromtimestamp(updated_at).isoformat(timespec="seconds")
+                    chunk.append((rank, user_id, name, score, stamp))
+                writer.writerows(chunk)
+        finally:
+            text.flush()
+            text.detach()  # `out` खुला रहे, caller उसे upload करेगा
+            conn.close()
+
+    def _delete_board_chunk_sync(self, table: str, chat_id: int, cutoff: float) -> int:
+        with self._conn:
+            return self._conn.execute(
+                f"DELETE FROM {table} WHERE rowid IN ("
+                f"SELECT rowid FROM {table} WHERE chat_id = ? AND updated_at <= ? LIMIT ?)",
+                (chat_id, cutoff, EXPORT_CHUNK_ROWS),
+            ).rowcount
+
+    def _close_sync(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+STORE = QuizStore(DB_PATH, DB_FLUSH_INTERVAL)
+
+
+# ---------- QUIZ SESSIONS (bounded, LRU + idle TTL) ----------
+QUIZ_FINISHED = -1  # DB में q_index: quiz पूरा, उसके बचे बटन अब grade नहीं होते
+
+
+class QuizSession:
+    __slots__ = ("sid", "q_index", "score", "touched", "bank", "deck", "start")
+
+    def __init__(self, sid: int, q_index: int = 0, score: int = 0, bank=None, deck: int = 0, start: int = 0):
+        self.sid = sid  # 0 = sid column से पहले की DB से restore हुआ
+        self.q_index = q_index  # quiz में position
+        self.score = score
+        self.touched = time.monotonic()
+        self.bank = bank  # quiz जिस bank version पर शुरू हुआ (None = restore हुआ, अगले जवाब से भरता है)
+        self.deck = deck
+        self.start = start  # user के stream में quiz का पहला offset
+
+
+SESSIONS_EVICTED = Counter("quiz_sessions_evicted_total", "Quiz sessions dropped from memory", "reason")
+METRICS.append(SESSIONS_EVICTED)
+
+
+class SessionStore:
+    # user_id -> QuizSession, सबसे पुराना touch सबसे आगे; cap और TTL दोनों से bounded
+    # (LRU से evict हुए user के बटन फिर भी चलते हैं: DB row रहती है, अगले tap पर वहीं से)
+    def __init__(self, max_sessions: int, idle_ttl: float):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions = OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, user_id: int):
+        session = self._sessions.get(user_id)
+        if session is None:
+            return None
+        now = time.monotonic()
+        if now - session.touched > self.idle_ttl:
+            self._evict(user_id, "ttl")
+            return None
+        session.touched = now
+        self._sessions.move_to_end(user_id)
+        return session
+
+    def put(self, user_id: int, session: QuizSession) -> QuizSession:
+        session.touched = time.monotonic()
+        self._sessions[user_id] = session
+        self._sessions.move_to_end(user_id)
+        self.sweep()
+        while len(self._sessions) > self.max_sessions:
+            self._evict(next(iter(self._sessions)), "lru")
+        return session
+
+    def finish(self, user_id: int, sid: int):
+        # row हटती नहीं, finished mark होती है: उस quiz के पुराने बटनों से replay नहीं
+        self._sessions.pop(user_id, None)
+        STORE.save_session(user_id, sid, QUIZ_FINISHED, 0)
+
+    def sweep(self):
+        # आगे से idle sessions हटाओ; पहला ताज़ा session मिलते ही रुक जाओ
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if session.touched > cutoff:
+                break
+            self._evict(user_id, "ttl")
+
+    def _evict(self, user_id: int, reason: str):
+        del self._sessions[user_id]
+        if reason == "ttl":
+            STORE.drop_session(user_id)
+        SESSIONS_EVICTED.inc(reason)
+
+
+SESSIONS = SessionStore(SESSION_MAX, SESSION_IDLE_TTL)
+
+
+async def session_sweep_job(context: ContextTypes.DEFAULT_TYPE):
+    SESSIONS.sweep()
+
+
+# ---------- HELPER: ADMIN CHECK ----------
+ADMIN_STATUSES = ("administrator", "creator")
+
+
+class AdminCache:
+    # chat_id -> (expires_at, admin user ids); LRU order में, ज़्यादा होने पर पुराने हटते हैं
+    def __init__(self, ttl: float, max_chats: int):
+        self.ttl = ttl
+        self.max_chats = max_chats
+        self._entries = OrderedDict()
+        self._inflight = {}
+
+    async def get_admin_ids(self, bot, chat_id: int) -> frozenset:
+        entry = self._entries.get(chat_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(chat_id)
+            return entry[1]
+
+        # एक ही chat के लिए एक समय पर सिर्फ एक fetch; बाकी उसी का इंतज़ार करें
+        task = self._inflight.get(chat_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(bot, chat_id))
+            self._inflight[chat_id] = task
+        return await asyncio.shield(task)
+
+    async def _fetch(self, bot, chat_id: int) -> frozenset:
+        me = asyncio.current_task()
+        try:
+            admins = await bot.get_chat_administrators(chat_id)
+        finally:
+            # fetch के दौरान invalidate हुआ हो तो entry पहले ही हट चुकी होगी
+            still_valid = self._inflight.get(chat_id) is me
+            if still_valid:
+                del self._inflight[chat_id]
+
+        admin_ids = frozenset(m.user.id for m in admins if m.status in ADMIN_STATUSES)
+        if still_valid:
+            self._entries[chat_id] = (time.monotonic() + self.ttl, admin_ids)
+            self._entries.move_to_end(chat_id)
+            while len(self._entries) > self.max_chats:
+                self._entries.popitem(last=False)
+        return admin_ids
+
+    def invalidate(self, chat_id: int):
+        self._entries.pop(chat_id, None)
+        # चल रहा fetch शायद पुरानी list लाएगा; अगला caller नया fetch करेगा
+        self._inflight.pop(chat_id, None)
+
+
+ADMIN_CACHE = AdminCache(ADMIN_CACHE_TTL, ADMIN_CACHE_MAX_CHATS)
+
+
+async def is_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    chat = update.effective_chat
+    user = update.effective_user
+
+    if chat.type not in ("group", "supergroup"):
+        # प्राइवेट चैट में सबको allow
+        return True
+
+    admin_ids = await ADMIN_CACHE.get_admin_ids(context.bot, chat.id)
+    return user.id in admin_ids
+
+
+@instrumented("on_chat_member")
+async def on_chat_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # promote / demote होते ही उस chat का admin cache हटाओ
+    change = update.chat_member or update.my_chat_member
+    old_status = change.old_chat_member.status
+    new_status = change.new_chat_member.status
+    if old_status != new_status and (
+        old_status in ADMIN_STATUSES or new_status in ADMIN_STATUSES
+    ):
+        ADMIN_CACHE.invalidate(change.chat.id)
+
+
+# ---------- SEND ONE QUESTION ----------
+async def send_question(update: Update, context: ContextTypes.DEFAULT_TYPE, session: QuizSession):
+    question = session_question(session, update.effective_user.id)
+    markup = session_markup(session, update.effective_user.id, question)
+
+    if update.callback_query:
+        return await update.callback_query.message.reply_text(text=question.text, reply_markup=markup)
+    return await update.message.reply_text(text=question.text, reply_markup=markup)
+
+
+# ---------- /start ----------
+@instrumented("start")
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(
+        "नमस्ते! 👋\n"
+        "मैं Mauryan Empire MCQ Quiz Bot हूँ.\n\n"
+        "▶ प्राइवेट चैट में: /quiz भेजकर क्विज़ शुरू करें\n"
+        "▶ ग्रुप में: केवल *admin* /quiz चला सकता है\n\n"
+        "Commands:\n"
+        "• /quiz [topic] [easy/medium/hard] – MCQ क्विज़\n"
+        "• /leaderboard – टॉप स्कोर\n"
+        "• /export – leaderboard की CSV file (admin)\n"
+        "• /reset_board – नए season के लिए leaderboard खाली (admin)\n"
+        "• /daily_on – रोज़ एक सवाल (chat के लिए)\n"
+        "• /daily_off – daily quiz बंद\n"
+        "• /round – group में एक सवाल का round (admin)\n"
+        "• /stats [topic] – कौन से सवाल सबसे ज़्यादा गलत होते हैं (admin)\n"
+    )
+
+
+# ---------- QUIZ START ( /quiz ) ----------
+@instrumented("quiz_command")
+async def quiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # admin check (group में)
+    if not await is_admin(update, context):
+        await update.message.reply_text("केवल *admin* /quiz चला सकता है।", parse_mode="Markdown")
+        return
+
+    # topic/tag (+ difficulty) -> deck, bank के index से सीधा
+    bank = BANK
+    name = context.args[0] if context.args else DEFAULT_TOPIC
+    deck = bank.find(name, *context.args[1:2])
+    if deck is None and not context.args:
+        name, deck = ALL_DECK, 0
+    if deck is None:
+        await update.message.reply_text(
+            f"'{' '.join(context.args)}' नहीं मिला।\nTopics: " + ", ".join(sorted(bank.titles))
+        )
+        return
+    title = bank.titles.get(name.lower(), name)
+
+    if POLL_MODE and update.effective_chat.type in ("group", "supergroup"):
+        # group में पूरा quiz polls से: सब members जवाब दें, Telegram grade करे
+        await update.message.reply_text(
+            f"🎯 {title} MCQ Quiz शुरू!\n"
+            f"हर सवाल {POLL_OPEN_PERIOD} सेकंड के लिए poll के रूप में आएगा।"
+        )
+        chat_id, total = update.effective_chat.id, bank.quiz_length(deck)
+        start = await take_questions(chat_id, bank, deck, total)
+        questions = tuple(stream_question(bank, deck, chat_id, start + i) for i in range(total))
+        await start_poll_run(context, chat_id, questions)
+        return
+
+    # user का अपना score reset, नया session id (पुराने quiz के बटन अब इसमें नहीं गिने जाएंगे)
+    # सवाल user के अपने stream से: पिछले quizzes वाले दोबारा नहीं, जब तक topic खत्म न हो
+    user_id = update.effective_user.id
+    start = await take_questions(user_id, bank, deck, bank.quiz_length(deck))
+    session = SESSIONS.put(user_id, QuizSession(new_session_id(), bank=bank, deck=deck, start=start))
+    STORE.save_session(user_id, session.sid, 0, 0)
+
+    intro = f"🎯 {title} MCQ Quiz शुरू!\nहर सवाल के सही विकल्प पर क्लिक करें।"
+    if QUESTION_TIME_LIMIT:
+        intro += f"\n⏱ हर सवाल के लिए {QUESTION_TIME_LIMIT} सेकंड।"
+    await update.message.reply_text(intro)
+
+    message = await send_question(update, context, session)
+    arm_question_timer(update, session, message.message_id)
+
+
+# ---------- DUPLICATE / STALE TAP GATE ----------
+class RecentKeys:
+    # TTL + cap वाला "देखा हुआ" set; सबसे पुराना सबसे आगे
+    def __init__(self, ttl: float, max_keys: int):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._keys = OrderedDict()
+
+    def seen(self, key) -> bool:
+        # True = पहले आ चुका; False = नया (और अब याद रख लिया)
+        now = time.monotonic()
+        expires = self._keys.get(key)
+        if expires is not None and expires > now:
+            return True
+        self._keys[key] = now + self.ttl
+        self._keys.move_to_end(key)
+        while self._keys:
+            oldest, oldest_expires = next(iter(self._keys.items()))
+            if oldest_expires > now and len(self._keys) <= self.max_keys:
+                break
+            del self._keys[oldest]
+        return False
+
+
+TAPS_SEEN = RecentKeys(TAP_DEDUP_TTL, TAP_DEDUP_MAX)
+CALLBACKS_DROPPED = Counter("quiz_callbacks_dropped_total", "Answer taps dropped before grading", "reason")
+METRICS.append(CALLBACKS_DROPPED)
+
+
+async def _cheap_answer(query, text: str):
+    # बहुत पुरानी query का answer Telegram reject कर देता है; उससे कोई फ़र्क नहीं
+    try:
+        await query.answer(text)
+    except BadRequest:
+        pass
+
+
+@instrumented("answer_gate")
+async def answer_gate(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # handle_answer से पहले (group -1): backlog में पुराने taps और double-taps यहीं रुकते हैं
+    query = update.callback_query
+    message = query.message
+
+    if update_backlog(context.application) > SHED_QUEUE_DEPTH and message is not None:
+        shown_at = message.edit_date or message.date
+        if shown_at is not None and time.time() - shown_at.timestamp() > CALLBACK_MAX_AGE:
+            CALLBACKS_DROPPED.inc("stale")
+            await _cheap_answer(query, "⌛ यह tap बहुत देर से पहुंचा, कृपया फिर से कोशिश करें।")
+            raise ApplicationHandlerStop
+
+    # key = message + user + सवाल (option के बिना); compact mode में एक message कई सवाल दिखाता है
+    if message is not None:
+        where = (message.chat_id, message.message_id)
+    else:
+        where = query.inline_message_id
+    key = (where, update.effective_user.id, query.data.rpartition(".")[0])
+    if TAPS_SEEN.seen(key):
+        CALLBACKS_DROPPED.inc("duplicate")
+        await _cheap_answer(query, "आप इस सवाल का जवाब दे चुके हैं।")
+        raise ApplicationHandlerStop
+
+
+# ---------- HANDLE ANSWER (inline buttons) ----------
+def finish_text(score: int, total: int) -> str:
+    return (
+        f"🎉 क्विज़ समाप्त!\nआपका स्कोर: {score}/{total}\n"
+        "फिर से शुरू करने के लिए /quiz भेजें।"
+    )
+
+
+def display_name(user) -> str:
+    return user.full_name or user.username or str(user.id)
+
+
+def submit_score(bot_data: dict, chat_id: int, user_id: int, name: str, score: int):
+    app_data = bot_data.setdefault("leaderboard", {})
+    chat_board = app_data.get(chat_id)
+    if chat_board is None:
+        chat_board = app_data[chat_id] = ChatBoard()
+
+    if chat_board.submit(user_id, name, score):
+        STORE.save_score(chat_id, user_id, name, score)
+
+
+def add_points(bot_data: dict, chat_id: int, user_id: int, name: str, points: int):
+    # rounds के points अलग board पर जुड़ते हैं; quiz board सिर्फ best /quiz score (दोनों मिलें तो best score बिगड़ता है)
+    boards = bot_data.setdefault("points", {})
+    board = boards.get(chat_id)
+    if board is None:
+        board = boards[chat_id] = ChatBoard(title=POINTS_BOARD_TITLE)
+    entry = board.entries.get(user_id)
+    total = (entry["score"] if entry else 0) + points
+    board.submit(user_id, name, total)
+    STORE.save_points(chat_id, user_id, name, total)
+
+
+def record_score(update: Update, context: ContextTypes.DEFAULT_TYPE, score: int):
+    user = update.effective_user
+    submit_score(
+        context.application.bot_data, update.effective_chat.id, user.id, display_name(user), score
+    )
+
+
+@instrumented("handle_answer")
+async def handle_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    user_id = update.effective_user.id
+
+    # सवाल, session और अब तक का score callback data से (worker का local state ज़रूरी नहीं)
+    # bank उसी version का जिस पर सवाल भेजा गया था (reload के बाद भी)
+    parsed = parse_answer(query.data, user_id)
+    bank = BANKS.get(parsed[0]) if parsed is not None else None
+    if bank is not None and 0 <= parsed[1] < len(bank.decks):
+        _, deck, start, q_index, sid, score, selected = parsed
+        if sid == 0:
+            valid = 0 <= start < len(bank.table)
+        else:
+            valid = start >= 0 and 0 <= q_index < bank.quiz_length(deck)
+    else:
+        valid = False
+    if not valid:
+        await query.answer("⚠️ यह बटन आपके लिए नहीं है या पुराना हो चुका है।")
+        return
+    if sid == 0:
+        question = bank.table[start]
+    else:
+        question = stream_question(bank, deck, user_id, start + q_index)
+
+    # सही/गलत चेक (correct index startup पर ही निकाल लिया गया है)
+    is_right = selected == question.correct
+
+    if sid == 0:
+        # daily सवाल: कोई session नहीं, verdict और (पहले जवाब पर) poll mode जैसा ही point
+        score_daily_answer(
+            context.application.bot_data, update.effective_chat.id, update.effective_user, question, selected
+        )
+        await query.answer(RIGHT_FEEDBACK if is_right else question.wrong_feedback, show_alert=True)
+        return
+
+    session = SESSIONS.get(user_id)
+    if session is None:
+        # memory में नहीं (evict/restart): DB की row बताती है कि यही quiz अभी चल रहा है
+        stored = await STORE.find_session(user_id, SESSION_IDLE_TTL)
+        if stored is None or stored[1] == QUIZ_FINISHED or stored[0] not in (0, sid):
+            # पूरा हो चुका / पुराना quiz: बचे बटनों से दोबारा खेलकर score नहीं बढ़ता
+            await query.answer("⚠️ यह quiz खत्म हो चुका है। नया शुरू करने के लिए /quiz भेजें।")
+            return
+        session = SESSIONS.put(user_id, QuizSession(*stored))
+    if session.sid not in (0, sid):
+        # user नया /quiz शुरू कर चुका है; पुराने quiz के बटन अब नहीं गिनते
+        await query.answer("⚠️ यह पुराने quiz का सवाल है।")
+        return
+    if session.q_index != q_index:
+        # इसी quiz का पुराना सवाल, उसका जवाब पहले ही हो चुका
+        await query.answer("यह सवाल पहले ही हल हो चुका है।")
+        return
+
+    if is_right:
+        score += 1
+    TIMERS.cancel(user_id)
+    ANALYTICS.record(question, selected)
+
+    # अगला question या finish
+    next_q = q_index + 1
+    total = bank.quiz_length(deck)
+    finish = finish_text(score, total) if next_q >= total else None
+    if finish:
+        record_score(update, context, score)
+        SESSIONS.finish(user_id, sid)
+    else:
+        # restore हुए session में bank/deck/start नहीं होते; callback data से भर दो
+        session.sid, session.q_index, session.score = sid, next_q, score
+        session.bank, session.deck, session.start = bank, deck, start
+        STORE.save_session(user_id, sid, next_q, score)
+
+    if ANSWER_MODE == "verbose":
+        message_id = await _answer_verbose(update, context, question, is_right, session, finish)
+    else:
+        message_id = await _answer_compact(update, context, question, is_right, session, finish)
+    if not finish:
+        arm_question_timer(update, session, message_id)
+
+
+async def _answer_verbose(update, context, question, is_right, session, finish):
+    query = update.callback_query
+    await query.answer()
+
+    sends = [query.message.reply_text(RIGHT_FEEDBACK if is_right else question.wrong_feedback)]
+    # explanation
+    if question.explanation_text:
+        sends.append(query.message.reply_text(question.explanation_text))
+    sends.append(query.message.reply_text(finish) if finish else send_question(update, context, session))
+
+    if SEND_COALESCE:
+        # साथ शुरू करो: SendCoalescer इन्हें (इसी क्रम में) एक message में जोड़ देता है
+        messages = await asyncio.gather(*sends)
+    else:
+        messages = [await send for send in sends]
+    return None if finish else messages[-1].message_id
+
+
+async def _answer_compact(update, context, question, is_right, session, finish):
+    # पुराने सवाल वाले message में ही verdict + explanation + अगला सवाल
+    query = update.callback_query
+    block = question.right_block if is_right else question.wrong_block
+
+    if finish:
+        text = _join_blocks(block, finish)
+        markup = None
+    else:
+        next_question = session_question(session, update.effective_user.id)
+        text = _join_blocks(block, next_question.text)
+        markup = session_markup(session, update.effective_user.id, next_question)
+
+    toast = RIGHT_FEEDBACK if is_right else "❌ गलत"
+    answered, edited = await asyncio.gather(
+        query.answer(text=toast),
+        query.edit_message_text(text=text, reply_markup=markup),
+        return_exceptions=True,
+    )
+    if isinstance(answered, Exception):
+        # callback query expire हो गई हो तो भी edit काम कर सकता है
+        logger.info("callback answer failed: %s", answered)
+    if isinstance(edited, BadRequest):
+        # बहुत पुराना message edit नहीं हो सका -> नया message
+        logger.info("compact edit failed (%s), falling back to reply", edited)
+        message = await query.message.reply_text(text=text, reply_markup=markup)
+        return message.message_id
+    if isinstance(edited, Exception):
+        raise edited
+    return query.message.message_id
+
+
+# ---------- TIMED QUESTIONS (hashed timer wheel) ----------
+class TimerWheel:
+    # slots[i]: key -> [बचे हुए चक्कर, payload]; schedule/cancel O(1), हर tick सिर्फ एक slot देखता है
+    def __init__(self, tick: float, slots: int, batch: int):
+        self.tick = tick
+        self.batch = batch
+        self.slots = [{} for _ in range(slots)]
+        self.where = {}  # key -> slot index
+        self.cursor = 0
+        self.on_expire = None  # async fn(payload)
+        self._task = None
+        self._firing = set()  # चल रहे _fire tasks; reference न रहे तो loop उन्हें बीच में GC कर सकता है
+
+    def __len__(self):
+        return len(self.where)
+
+    def schedule(self, key, delay: float, payload):
+        self.cancel(key)
+        ticks = max(1, math.ceil(delay / self.tick))
+        slot = (self.cursor + ticks) % len(self.slots)
+        self.slots[slot][key] = [(ticks - 1) // len(self.slots), payload]
+        self.where[key] = slot
+
+    def cancel(self, key):
+        slot = self.where.pop(key, None)
+        if slot is not None:
+            del self.slots[slot][key]
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        next_at = time.monotonic()
+        while True:
+            next_at += self.tick
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+            self.cursor = (self.cursor + 1) % len(self.slots)
+            bucket = self.slots[self.cursor]
+            expired = []
+            for key, entry in list(bucket.items()):
+                if entry[0]:
+                    entry[0] -= 1
+                else:
+                    del bucket[key]
+                    del self.where[key]
+                    expired.append(entry[1])
+            if expired:
+                # ticks न रुकें: firing अलग task में, batches में
+                task = asyncio.create_task(self._fire(expired))
+                self._firing.add(task)
+                task.add_done_callback(self._firing.discard)
+
+    async def _fire(self, expired: list):
+        for i in range(0, len(expired), self.batch):
+            results = await asyncio.gather(
+                *(self.on_expire(p) for p in expired[i : i + self.batch]), return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error("question timeout failed", exc_info=result)
 
 
-# ---------- HELPER: ADMIN CHECK ----------
-async def is_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
-    chat = update.effective_chat
-    user = update.effective_user
+TIMERS = TimerWheel(TIMER_TICK, TIMER_SLOTS, TIMER_BATCH)
 
-    if chat.type not in ("group", "supergroup"):
-        # प्राइवेट चैट में सबको allow
-        return True
 
-    member = await context.bot.get_chat_member(chat.id, user.id)
-    return member.status in ("administrator", "creator")
+def arm_question_timer(update: Update, session: QuizSession, message_id):
+    if QUESTION_TIME_LIMIT and message_id is not None:
+        user = update.effective_user
+        payload = (user.id, session.sid, session.q_index, update.effective_chat.id, message_id, display_name(user))
+        TIMERS.schedule(user.id, QUESTION_TIME_LIMIT, payload)
 
 
-# ---------- SEND ONE QUESTION ----------
-async def send_question(
-    update: Update, context: ContextTypes.DEFAULT_TYPE, q_index: int
-):
-    question_data = QUESTIONS[q_index]
-    context.user_data["q_index"] = q_index
-
-    buttons = [
-        [InlineKeyboardButton(text=opt, callback_data=f"answer_{i}")]
-        for i, opt in enumerate(question_data["options"])
-    ]
-    markup = InlineKeyboardMarkup(buttons)
+async def expire_question(app, payload):
+    user_id, sid, q_index, chat_id, message_id, name = payload
+    session = SESSIONS.get(user_id)
+    if session is None or session.sid != sid or session.q_index != q_index:
+        return  # इस बीच जवाब आ गया या नया quiz
 
-    text = question_data["question"]
+    question = session_question(session, user_id)
+    ANALYTICS.record(question, TIMEOUT_SLOT)
+    next_q = q_index + 1
+    total = session.bank.quiz_length(session.deck)
+    finished = next_q >= total
+    if finished:
+        submit_score(app.bot_data, chat_id, user_id, name, session.score)
+        SESSIONS.finish(user_id, sid)
+        after, markup = finish_text(session.score, total), None
+    else:
+        session.q_index = next_q
+        STORE.save_session(user_id, sid, next_q, session.score)
+        next_question = session_question(session, user_id)
+        after, markup = next_question.text, session_markup(session, user_id, next_question)
 
-    if update.callback_query:
-        await update.callback_query.message.reply_text(text=text, reply_markup=markup)
+    # timeouts एक साथ बहुत हो सकते हैं, इसलिए outbox वाली global rate limit से
+    await OUTBOX.bucket.acquire()
+    if ANSWER_MODE != "verbose":
+        text = _join_blocks(question.timeout_block, after)
+        await app.bot.edit_message_text(text, chat_id=chat_id, message_id=message_id, reply_markup=markup)
     else:
-        await update.message.reply_text(text=text, reply_markup=markup)
+        # सवाल वाले message में पिछले जवाब का feedback भी हो सकता है; उसे छेड़े बिना बस बटन हटाओ
+        await app.bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id, reply_markup=None)
+        await OUTBOX.bucket.acquire()
+        text = _join_blocks(question.timeout_feedback, question.explanation_text, after)
+        message = await app.bot.send_message(chat_id, text, reply_markup=markup)
+        message_id = message.message_id
 
+    if not finished:
+        TIMERS.schedule(
+            user_id, QUESTION_TIME_LIMIT, (user_id, sid, next_q, chat_id, message_id, name)
+        )
 
-# ---------- /start ----------
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(
-        "नमस्ते! 👋\n"
-        "मैं Mauryan Empire MCQ Quiz Bot हूँ.\n\n"
-        "▶ प्राइवेट चैट में: /quiz भेजकर क्विज़ शुरू करें\n"
-        "▶ ग्रुप में: केवल *admin* /quiz चला सकता है\n\n"
-        "Commands:\n"
-        "• /quiz – पूरा MCQ क्विज़\n"
-        "• /leaderboard – टॉप स्कोर\n"
-        "• /daily_on – रोज़ एक सवाल (chat के लिए)\n"
-        "• /daily_off – daily quiz बंद\n"
-    )
 
+# ---------- /leaderboard ----------
+@instrumented("leaderboard")
+async def leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+    bot_data = context.application.bot_data
+    boards = [
+        board
+        for board in (bot_data.get("leaderboard", {}).get(chat_id), bot_data.get("points", {}).get(chat_id))
+        if board
+    ]
 
-# ---------- QUIZ START ( /quiz ) ----------
-async def quiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    # admin check (group में)
-    if not await is_admin(update, context):
-        await update.message.reply_text("केवल *admin* /quiz चला सकता है।", parse_mode="Markdown")
+    if not boards:
+        await update.message.reply_text("अभी तक किसी ने क्विज़ पूरा नहीं किया। 🙂")
         return
 
-    # user का अपना score reset
-    context.user_data["score"] = 0
-    context.user_data["q_index"] = 0
+    # top-10 text cache से; सिर्फ अपनी rank अलग से जोड़ो
+    parts = []
+    for board in boards:
+        text = board.top_text()
+        my_rank = board.rank(update.effective_user.id)
+        if my_rank is not None:
+            text += f"\nआपकी rank: {my_rank[0]:,} / {my_rank[1]:,}"
+        parts.append(text)
 
-    await update.message.reply_text(
-        "🎯 Mauryan Empire MCQ Quiz शुरू!\n"
-        "हर सवाल के सही विकल्प पर क्लिक करें।"
-    )
+    await update.message.reply_text("\n\n".join(parts), parse_mode="Markdown")
 
-    await send_question(update, context, 0)
 
+# ---------- /export और /reset_board (admin) ----------
+EXPORTS_RUNNING = set()  # chat_id
 
-# ---------- HANDLE ANSWER (inline buttons) ----------
-async def handle_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
 
-    selected = int(query.data.split("_")[1])
-    q_index = context.user_data.get("q_index", 0)
+@instrumented("export")
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await is_admin(update, context):
+        await update.message.reply_text("केवल admin /export कर सकता है।")
+        return
 
-    question = QUESTIONS[q_index]
+    chat_id = update.effective_chat.id
+    if not context.application.bot_data.get("leaderboard", {}).get(chat_id):
+        await update.message.reply_text("अभी तक किसी ने क्विज़ पूरा नहीं किया। 🙂")
+        return
+    if chat_id in EXPORTS_RUNNING:
+        await update.message.reply_text("Export पहले से चल रहा है।")
+        return
 
-    # correct letter -> index
-    letters = ["A", "B", "C", "D"]
-    correct_letter = question["correct"].upper().strip()
+    EXPORTS_RUNNING.add(chat_id)
     try:
-        correct_index = letters.index(correct_letter)
-    except ValueError:
-        # अगर गलती से wrong data हो
-        correct_index = 0
+        await STORE.flush()  # अभी तक के scores भी file में आएं
+        # CSV worker thread पर बनती है; event loop बाकी chats के updates चलाता रहता है
+        with tempfile.NamedTemporaryFile(prefix="leaderboard-", suffix=".csv") as out:
+            rows = await STORE.export_leaderboard(chat_id, out)
+            out.seek(0)
+            # read_file_handle=False: httpx file handle से टुकड़ों में पढ़कर upload करता है, पूरी file memory में नहीं
+            document = InputFile(
+                out,
+                filename=f"leaderboard-{chat_id}-{time.strftime('%Y%m%d')}.csv",
+                read_file_handle=False,
+            )
+            await context.bot.send_document(chat_id, document=document, caption=f"📄 Leaderboard: {rows:,} खिलाड़ी")
+    finally:
+        EXPORTS_RUNNING.discard(chat_id)
 
-    # सही/गलत चेक
-    if selected == correct_index:
-        context.user_data["score"] = context.user_data.get("score", 0) + 1
-        feedback = "✅ सही जवाब!"
-    else:
-        feedback = f"❌ गलत.\nसही जवाब: {question['options'][correct_index]}"
 
-    await query.message.reply_text(feedback)
+@instrumented("reset_board")
+async def reset_board_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await is_admin(update, context):
+        await update.message.reply_text("केवल admin leaderboard reset कर सकता है।")
+        return
+    if context.args[:1] != ["confirm"]:
+        await update.message.reply_text(
+            "⚠️ इस चैट का पूरा leaderboard मिट जाएगा।\n"
+            "पहले /export कर लें, फिर /reset_board confirm भेजें।"
+        )
+        return
 
-    # explanation
-    explanation = question.get("explanation")
-    if explanation:
-        await query.message.reply_text(f"ℹ️ व्याख्या:\n{explanation}")
+    chat_id = update.effective_chat.id
+    # memory से तुरंत (नए scores नए board पर), DB से chunks में
+    context.application.bot_data.get("leaderboard", {}).pop(chat_id, None)
+    context.application.bot_data.get("points", {}).pop(chat_id, None)
+    deleted = await STORE.reset_board(chat_id)
+    await update.message.reply_text(f"🧹 Leaderboard reset हो गया ({deleted:,} entries हटाईं)।")
 
-    # अगला question या finish
-    next_q = q_index + 1
-    if next_q < len(QUESTIONS):
-        await send_question(update, context, next_q)
-    else:
-        score = context.user_data.get("score", 0)
-        total = len(QUESTIONS)
 
-        # LEADERBOARD update
-        app_data = context.application.bot_data.setdefault("leaderboard", {})
-        chat_id = update.effective_chat.id
-        chat_board = app_data.setdefault(chat_id, {})
+# ---------- QUESTION ANALYTICS (/stats) ----------
+STAT_SLOTS = len(LETTERS) + 1  # हर सवाल: options A-D + timeout
+TIMEOUT_SLOT = len(LETTERS)
 
-        user = update.effective_user
-        display_name = user.full_name or user.username or str(user.id)
 
-        prev = chat_board.get(user.id)
-        if (not prev) or (score > prev["score"]):
-            chat_board[user.id] = {"score": score, "name": display_name}
+class QuestionStats:
+    # row = एक सवाल (key से); हर tap पर बस pending[row * STAT_SLOTS + option] += 1
+    # flush (interval पर) pending को totals में जोड़ता है, DB को delta देता है और /stats cache हटाता है
+    def __init__(self):
+        self.rows = {}  # question key -> row
+        self.keys = []  # row -> question key
+        self.pending = array("Q")  # आखिरी flush के बाद की गिनती
+        self.totals = array("Q")  # DB + flush हो चुकी गिनती; /stats सिर्फ इसे पढ़ता है
+        self.dirty = set()  # pending में जिन rows में कुछ है
+        self._loaded = {}  # DB की rows जिनका सवाल अभी किसी bank में नहीं
+        self._reports = {}  # (bank version, deck) -> /stats text
 
-        await query.message.reply_text(
-            f"🎉 क्विज़ समाप्त!\nआपका स्कोर: *{score}/{total}*\n"
-            "फिर से शुरू करने के लिए /quiz भेजें।",
-            parse_mode="Markdown",
-        )
-        context.user_data.clear()
+    def register(self, bank: QuestionBank):
+        # bank के नए सवालों के लिए rows पहले से allocate (tap पर कभी resize नहीं)
+        new = list(dict.fromkeys(q.key for q in bank.table if q.key not in self.rows))
+        base = len(self.keys)
+        zeros = array("Q", bytes(8 * STAT_SLOTS * len(new)))
+        self.pending.extend(zeros)
+        self.totals.extend(zeros)
+        self.keys.extend(new)
+        for i, key in enumerate(new):
+            self.rows[key] = base + i
+            counts = self._loaded.pop(key, None)
+            if counts is not None:
+                self._set_totals(base + i, counts)
 
+    def load(self, stored: dict):
+        for key, counts in stored.items():
+            row = self.rows.get(key)
+            if row is None:
+                self._loaded[key] = counts
+            else:
+                self._set_totals(row, counts)
+        self._reports.clear()
 
-# ---------- /leaderboard ----------
-async def leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    chat_id = update.effective_chat.id
-    app_data = context.application.bot_data.get("leaderboard", {})
-    chat_board = app_data.get(chat_id, {})
+    def _set_totals(self, row: int, counts):
+        self.totals[row * STAT_SLOTS : (row + 1) * STAT_SLOTS] = array("Q", counts)
 
-    if not chat_board:
-        await update.message.reply_text("अभी तक किसी ने क्विज़ पूरा नहीं किया। 🙂")
+    def record(self, question: CompiledQuestion, slot: int):
+        if 0 <= slot < len(question.options) or slot == TIMEOUT_SLOT:
+            row = self.rows[question.key]
+            self.pending[row * STAT_SLOTS + slot] += 1
+            self.dirty.add(row)
+
+    def flush(self):
+        if not self.dirty:
+            return
+        deltas = {}
+        for row in self.dirty:
+            start = row * STAT_SLOTS
+            counts = self.pending[start : start + STAT_SLOTS]
+            for i, n in enumerate(counts):
+                self.totals[start + i] += n
+                self.pending[start + i] = 0
+            deltas[self.keys[row]] = tuple(counts)
+        self.dirty.clear()
+        self._reports.clear()
+        STORE.add_question_stats(deltas)
+
+    def report(self, bank: QuestionBank, deck: int, title: str) -> str:
+        cache_key = (bank.version, deck)
+        text = self._reports.get(cache_key)
+        if text is None:
+            text = self._reports[cache_key] = self._render(bank, deck, title)
+        return text
+
+    def _render(self, bank: QuestionBank, deck: int, title: str) -> str:
+        answered = correct = 0
+        ranked = []
+        for qid in bank.decks[deck]:
+            question = bank.table[qid]
+            start = self.rows[question.key] * STAT_SLOTS
+            counts = self.totals[start : start + STAT_SLOTS]
+            total = sum(counts)
+            answered += total
+            correct += counts[question.correct]
+            if total >= STATS_MIN_ANSWERS:
+                ranked.append((counts[question.correct] / total, total, question, counts))
+        if not answered:
+            return f"📊 {title}\nअभी कोई data नहीं।"
+
+        lines = [f"📊 {title}", f"जवाब: {answered:,} · सही: {100 * correct / answered:.0f}%"]
+        ranked.sort(key=lambda entry: entry[0])
+        if ranked:
+            lines.extend(["", "सबसे कठिन सवाल:"])
+        for n, (accuracy, total, question, counts) in enumerate(ranked[:STATS_HARDEST], start=1):
+            lines.append(f"{n}. {_clip(question.text, 80)} — {100 * accuracy:.0f}% सही ({total:,})")
+            parts = [
+                f"{LETTERS[i]} {100 * counts[i] / total:.0f}%" + (" ✅" if i == question.correct else "")
+                for i in range(len(question.options))
+            ]
+            if counts[TIMEOUT_SLOT]:
+                parts.append(f"⏰ {100 * counts[TIMEOUT_SLOT] / total:.0f}%")
+            lines.append("   " + " · ".join(parts))
+        return "\n".join(lines)
+
+
+ANALYTICS = QuestionStats()
+
+
+async def stats_flush_job(context: ContextTypes.DEFAULT_TYPE):
+    ANALYTICS.flush()
+
+
+@instrumented("stats")
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await is_admin(update, context):
+        await update.message.reply_text("केवल admin /stats देख सकता है।")
+        return
+
+    bank = BANK
+    name = context.args[0] if context.args else ALL_DECK
+    deck = 0 if name == ALL_DECK else bank.find(name, *context.args[1:2])
+    if deck is None:
+        await update.message.reply_text(
+            f"'{' '.join(context.args)}' नहीं मिला।\nTopics: " + ", ".join(sorted(bank.titles))
+        )
         return
+    title = "सभी सवाल" if deck == 0 else bank.titles.get(name.lower(), name)
+    # cached snapshot से (हर STATS_FLUSH_INTERVAL पर ताज़ा); जवाब देने वाले रास्ते पर कोई असर नहीं
+    await update.message.reply_text(ANALYTICS.report(bank, deck, title))
+
 
-    # high to low sort
-    sorted_scores = sorted(
-        chat_board.items(), key=lambda x: x[1]["score"], reverse=True
+# ---------- QUIZ POLLS (Telegram खुद grade करता है) ----------
+def poll_kwargs(question: CompiledQuestion, **extra) -> dict:
+    return dict(
+        question=question.poll_question,
+        options=question.poll_options,
+        type=Poll.QUIZ,
+        correct_option_id=question.correct,
+        explanation=question.poll_explanation or None,
+        **extra,
     )
 
-    lines = ["🏆 *Leaderboard*"]
-    for rank, (user_id, data) in enumerate(sorted_scores[:10], start=1):
-        lines.append(f"{rank}. {data['name']} — {data['score']}")
 
-    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+class PollRun:
+    # group में चल रहा एक poll quiz; scores: user_id -> [name, सही जवाब]
+    __slots__ = ("chat_id", "questions", "q_index", "scores", "poll_ids")
 
+    def __init__(self, chat_id: int, questions: tuple):
+        self.chat_id = chat_id
+        self.questions = questions  # शुरू होते समय के bank से; reload का असर नहीं
+        self.q_index = 0
+        self.scores = {}
+        self.poll_ids = []
 
-# ---------- DAILY QUIZ JOB ----------
-async def daily_quiz_job(context: ContextTypes.DEFAULT_TYPE):
-    job_data = context.job.data
-    chat_id = job_data["chat_id"]
 
-    # simple: हमेशा पहला सवाल या random भी कर सकते हैं
-    question_index = 0
-    question = QUESTIONS[question_index]
+POLL_RUNS = {}  # chat_id -> PollRun
+POLL_OWNER = {}  # poll_id -> (PollRun, CompiledQuestion)
+
+
+def _end_poll_run(run: PollRun):
+    if POLL_RUNS.get(run.chat_id) is run:
+        del POLL_RUNS[run.chat_id]
+    for poll_id in run.poll_ids:
+        POLL_OWNER.pop(poll_id, None)
+
+
+async def start_poll_run(context: ContextTypes.DEFAULT_TYPE, chat_id: int, questions: tuple):
+    old = POLL_RUNS.get(chat_id)
+    if old is not None:
+        _end_poll_run(old)
+    run = POLL_RUNS[chat_id] = PollRun(chat_id, questions)
+    await _send_run_poll(context, run)
+
+
+async def _send_run_poll(context: ContextTypes.DEFAULT_TYPE, run: PollRun):
+    question = run.questions[run.q_index]
+    message = await context.bot.send_poll(
+        run.chat_id,
+        is_anonymous=False,  # तभी PollAnswer updates आते हैं
+        open_period=POLL_OPEN_PERIOD,
+        **poll_kwargs(question),
+    )
+    run.poll_ids.append(message.poll.id)
+    POLL_OWNER[message.poll.id] = (run, question)
+    # poll बंद होने के थोड़ी देर बाद अगला (आखिरी answers पहुंच जाएं)
+    context.job_queue.run_once(
+        poll_run_next, POLL_OPEN_PERIOD + 2, data=run, name=f"poll-run-{run.chat_id}"
+    )
 
-    buttons = [
-        [InlineKeyboardButton(text=opt, callback_data=f"answer_{i}")]
-        for i, opt in enumerate(question["options"])
-    ]
-    markup = InlineKeyboardMarkup(buttons)
 
-    await context.bot.send_message(
-        chat_id=chat_id,
-        text="📅 Daily Quiz:\n" + question["question"],
-        reply_markup=markup,
+@instrumented("poll_run_next")
+async def poll_run_next(context: ContextTypes.DEFAULT_TYPE):
+    run = context.job.data
+    if POLL_RUNS.get(run.chat_id) is not run:
+        return  # इस बीच नया /quiz शुरू हो गया
+
+    run.q_index += 1
+    if run.q_index < len(run.questions):
+        await _send_run_poll(context, run)
+        return
+
+    _end_poll_run(run)
+    for user_id, (name, score) in run.scores.items():
+        submit_score(context.application.bot_data, run.chat_id, user_id, name, score)
+
+    ranked = sorted(run.scores.values(), key=lambda entry: entry[1], reverse=True)
+    lines = ["🎉 क्विज़ समाप्त!"]
+    for rank, (name, score) in enumerate(ranked[:LEADERBOARD_SIZE], start=1):
+        lines.append(f"{rank}. {name} — {score}/{len(run.questions)}")
+    if not ranked:
+        lines.append("किसी ने जवाब नहीं दिया। 🙂")
+    await context.bot.send_message(run.chat_id, "\n".join(lines))
+
+
+@instrumented("on_poll_answer")
+async def on_poll_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    answer = update.poll_answer
+    if answer.user is None:
+        return  # anonymous channel vote
+
+    chat_id = DAILY_POLL_CHAT.get(answer.poll_id)
+    if chat_id is not None:
+        if answer.option_ids:
+            question = DAILY_OPEN[chat_id].question
+            score_daily_answer(context.application.bot_data, chat_id, answer.user, question, answer.option_ids[0])
+        return
+
+    owner = POLL_OWNER.get(answer.poll_id)
+    if owner is None:
+        return  # पुराना run
+
+    run, question = owner
+    entry = run.scores.get(answer.user.id)
+    if entry is None:
+        entry = run.scores[answer.user.id] = [display_name(answer.user), 0]
+    if answer.option_ids:
+        ANALYTICS.record(question, answer.option_ids[0])
+        if answer.option_ids[0] == question.correct:
+            entry[1] += 1
+
+
+# ---------- GROUP ROUNDS (aggregated, debounced results) ----------
+class GroupRound:
+    # हर member का सिर्फ पहला जवाब गिना जाता है; message हर tap पर नहीं, ROUND_EDIT_INTERVAL पर edit होता है
+    __slots__ = (
+        "chat_id", "rid", "question", "seconds", "message_id", "started", "closed",
+        "counts", "answered", "fastest", "shown", "edit_task",
+    )
+
+    def __init__(self, chat_id: int, rid: int, question: CompiledQuestion, seconds: int):
+        self.chat_id = chat_id
+        self.rid = rid
+        self.question = question
+        self.seconds = seconds
+        self.message_id = None
+        self.started = time.monotonic()
+        self.closed = False
+        self.counts = [0] * len(question.options)
+        self.answered = {}  # user_id -> (option, name)
+        self.fastest = []  # (seconds, name) सही जवाबों में सबसे तेज़
+        self.shown = None  # आखिरी बार message में दिखाया गया text
+        self.edit_task = None
+
+    def render(self) -> str:
+        question = self.question
+        lines = [question.text, "", f"📊 जवाब: {len(self.answered)}"]
+        for i, opt in enumerate(question.options):
+            mark = " ✅" if self.closed and i == question.correct else ""
+            lines.append(f"{opt}: {self.counts[i]}{mark}")
+        if self.closed:
+            if self.fastest:
+                lines.append("")
+                lines.append("⚡ सबसे तेज़ सही जवाब:")
+                lines.extend(f"{n}. {name} ({sec:.1f}s)" for n, (sec, name) in enumerate(self.fastest, 1))
+            if question.explanation_text:
+                lines.extend(["", question.explanation_text])
+        else:
+            lines.extend(["", f"⏱ {self.seconds} सेकंड का round"])
+        return "\n".join(lines)
+
+
+ROUNDS = {}  # chat_id -> GroupRound
+
+
+def round_markup(rnd: GroupRound) -> InlineKeyboardMarkup:
+    prefix = f"r.{rnd.rid}.{_callback_sig(0, f'r{rnd.rid}')}."
+    return InlineKeyboardMarkup(
+        [
+            [InlineKeyboardButton(text=opt, callback_data=f"{prefix}{i}")]
+            for i, opt in enumerate(rnd.question.options)
+        ]
     )
 
 
+async def _edit_round(bot, rnd: GroupRound):
+    text = rnd.render()
+    if text == rnd.shown:
+        return
+    rnd.shown = text
+    try:
+        await bot.edit_message_text(
+            text,
+            chat_id=rnd.chat_id,
+            message_id=rnd.message_id,
+            reply_markup=None if rnd.closed else round_markup(rnd),
+        )
+    except BadRequest as exc:
+        logger.info("round %s edit failed: %s", rnd.rid, exc)
+
+
+async def _debounced_edit(bot, rnd: GroupRound):
+    await asyncio.sleep(ROUND_EDIT_INTERVAL)
+    rnd.edit_task = None
+    if not rnd.closed:
+        await _edit_round(bot, rnd)
+
+
+@instrumented("round_command")
+async def round_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat = update.effective_chat
+    if chat.type not in ("group", "supergroup"):
+        await update.message.reply_text("/round सिर्फ group में चलता है। यहां /quiz भेजें।")
+        return
+    if not await is_admin(update, context):
+        await update.message.reply_text("केवल admin round शुरू कर सकता है।")
+        return
+    # offset पहले memory में, ताकि check से ROUNDS में डालने तक कोई await न हो (दो admins साथ में /round)
+    await STREAMS.prefetch([(chat.id, ALL_DECK)])
+    if chat.id in ROUNDS:
+        await update.message.reply_text("एक round पहले से चल रहा है।")
+        return
+
+    seconds = ROUND_SECONDS
+    if context.args and context.args[0].isdigit():
+        seconds = min(max(int(context.args[0]), 5), 600)
+
+    # chat के stream से अगला सवाल (daily के साथ साझा, तो दोनों में repeat नहीं)
+    bank = BANK
+    question = stream_question(bank, 0, chat.id, await take_questions(chat.id, bank, 0, 1))
+    rnd = ROUNDS[chat.id] = GroupRound(chat.id, new_session_id(), question, seconds)
+    rnd.shown = rnd.render()
+    message = await context.bot.send_message(chat.id, rnd.shown, reply_markup=round_markup(rnd))
+    rnd.message_id = message.message_id
+    context.job_queue.run_once(close_round, seconds, data=rnd, name=f"round-{chat.id}")
+
+
+@instrumented("handle_round_answer")
+async def handle_round_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    parts = query.data.split(".")
+    rnd = ROUNDS.get(update.effective_chat.id)
+    if (
+        len(parts) != 4
+        or rnd is None
+        or parts[1] != str(rnd.rid)
+        or not hmac.compare_digest(parts[2], _callback_sig(0, f"r{rnd.rid}"))
+        or not parts[3].isdigit()
+        or int(parts[3]) >= len(rnd.counts)
+    ):
+        await query.answer("⌛ यह round खत्म हो चुका है।")
+        return
+
+    user = update.effective_user
+    if user.id in rnd.answered:
+        await query.answer("आप इस round में जवाब दे चुके हैं।")
+        return
+
+    selected = int(parts[3])
+    question = rnd.question
+    name = display_name(user)
+    rnd.answered[user.id] = (selected, name)
+    rnd.counts[selected] += 1
+    ANALYTICS.record(question, selected)
+    if selected == question.correct and len(rnd.fastest) < ROUND_FASTEST:
+        rnd.fastest.append((time.monotonic() - rnd.started, name))
+
+    # हर tap पर सिर्फ callback answer; results message debounce से
+    if rnd.edit_task is None:
+        rnd.edit_task = asyncio.create_task(_debounced_edit(context.bot, rnd))
+    await query.answer("✅ जवाब दर्ज हो गया! नतीजा round के अंत में।")
+
+
+@instrumented("close_round")
+async def close_round(context: ContextTypes.DEFAULT_TYPE):
+    rnd = context.job.data
+    rnd.closed = True
+    if ROUNDS.get(rnd.chat_id) is rnd:
+        del ROUNDS[rnd.chat_id]
+    if rnd.edit_task is not None:
+        rnd.edit_task.cancel()
+        rnd.edit_task = None
+
+    # सही जवाब = 1 point, chat के points board पर
+    correct = rnd.question.correct
+    bot_data = context.application.bot_data
+    for user_id, (option, name) in rnd.answered.items():
+        if option == correct:
+            add_points(bot_data, rnd.chat_id, user_id, name, 1)
+
+    await _edit_round(context.bot, rnd)
+
+
+# ---------- OUTBOUND QUEUE (rate limited) ----------
+def _seconds(value) -> float:
+    # RetryAfter.retry_after PTB version के हिसाब से int या timedelta होता है
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "stamp", "paused_until")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = time.monotonic()
+        self.paused_until = 0.0
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class OutboundQueue:
+    # सारे broadcast messages यहीं से: global token bucket + per-chat spacing + retry
+    def __init__(self, rate: float, per_chat_interval: float, workers: int, max_retries: int):
+        self.bucket = TokenBucket(rate, capacity=rate)
+        self.per_chat_interval = per_chat_interval
+        self.workers = workers
+        self.max_retries = max_retries
+        self.on_blocked = None  # chat ने bot हटा दिया/block किया
+        self.on_migrated = None  # group -> supergroup
+        self.stats = {"sent": 0, "retried": 0, "failed": 0}
+        self._queue = asyncio.Queue()
+        self._chat_next = {}  # chat_id -> अगला message कब भेज सकते हैं
+        self._pending = 0
+        self._tasks = []
+        self._bot = None
+
+    def start(self, bot):
+        self._bot = bot
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pending:
+            logger.warning("outbox stopped with %d undelivered messages", self._pending)
+
+    def submit(self, chat_id: int, text: str, reply_markup=None):
+        self.submit_call(chat_id, "send_message", text=text, reply_markup=reply_markup)
+
+    def submit_poll(self, chat_id: int, on_sent=None, **poll):
+        self.submit_call(chat_id, "send_poll", on_sent, **poll)
+
+    def submit_call(self, chat_id: int, method: str, on_sent=None, **kwargs):
+        # on_sent(chat_id, result): भेजे जाने के बाद (जैसे poll id याद रखने के लिए)
+        self._pending += 1
+        self._queue.put_nowait((chat_id, method, kwargs, 0, on_sent))
+
+    def _requeue_later(self, delay: float, item):
+        asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, item)
+
+    def _done(self, key: str):
+        self.stats[key] += 1
+        self._pending -= 1
+        if self._pending == 0:
+            logger.info("outbox drained: %s", self.stats)
+            # पुरानी per-chat entries अब किसी काम की नहीं
+            now = time.monotonic()
+            self._chat_next = {c: t for c, t in self._chat_next.items() if t > now}
+
+    async def _worker(self):
+        while True:
+            item = await self._queue.get()
+            chat_id, method, kwargs, attempt, on_sent = item
+
+            wait = self._chat_next.get(chat_id, 0) - time.monotonic()
+            if wait > 0:
+                self._requeue_later(wait, item)
+                continue
+            self._chat_next[chat_id] = time.monotonic() + self.per_chat_interval
+
+            await self.bucket.acquire()
+            try:
+                result = await getattr(self._bot, method)(chat_id=chat_id, **kwargs)
+            except RetryAfter as exc:
+                # flood limit: सबको रोको, यही message बाद में फिर
+                delay = _seconds(exc.retry_after)
+                self.bucket.pause(delay)
+                self.stats["retried"] += 1
+                self._requeue_later(delay, item)
+            except ChatMigrated as exc:
+                if self.on_migrated:
+                    self.on_migrated(chat_id, exc.new_chat_id)
+                self.stats["retried"] += 1
+                self._queue.put_nowait((exc.new_chat_id, method, kwargs, attempt, on_sent))
+            except Forbidden as exc:
+                logger.info("outbox: chat %s unreachable (%s)", chat_id, exc)
+                if self.on_blocked:
+                    self.on_blocked(chat_id)
+                self._done("failed")
+            except BadRequest as exc:
+                logger.info("outbox: %s to %s rejected (%s)", method, chat_id, exc)
+                self._done("failed")
+            except NetworkError as exc:
+                if attempt + 1 >= self.max_retries:
+                    logger.warning("outbox: giving up on chat %s: %s", chat_id, exc)
+                    self._done("failed")
+                else:
+                    self.stats["retried"] += 1
+                    self._requeue_later(2**attempt, (chat_id, method, kwargs, attempt + 1, on_sent))
+            except Exception:
+                logger.exception("outbox: send to %s failed", chat_id)
+                self._done("failed")
+            else:
+                self._done("sent")
+                if on_sent is not None:
+                    on_sent(chat_id, result)
+
+
+OUTBOX = OutboundQueue(
+    OUTBOX_GLOBAL_RATE, OUTBOX_PER_CHAT_INTERVAL, OUTBOX_WORKERS, OUTBOX_MAX_RETRIES
+)
+
+
+# ---------- DAILY QUIZ (एक scheduler, minute slots) ----------
+def current_minute() -> int:
+    now = time.localtime()
+    return now.tm_hour * 60 + now.tm_min
+
+
+class DailyScheduler:
+    # हर chat का एक slot (दिन का minute); एक ही job हर minute due slots निकालता है
+    def __init__(self):
+        self.slots = {}  # minute -> set(chat_id)
+        self.chat_slot = {}
+        self._last_minute = None
+
+    def load(self, subs: dict):
+        for chat_id, slot in subs.items():
+            self.chat_slot[chat_id] = slot
+            self.slots.setdefault(slot, set()).add(chat_id)
+
+    def subscribe(self, chat_id: int, slot: int) -> bool:
+        # True = इस minute का tick हो चुका, पहला सवाल अभी खुद भेजो
+        self.unsubscribe(chat_id)
+        self.chat_slot[chat_id] = slot
+        self.slots.setdefault(slot, set()).add(chat_id)
+        STORE.save_subscription(chat_id, slot)
+        return self._last_minute == slot
+
+    def unsubscribe(self, chat_id: int) -> bool:
+        slot = self.chat_slot.pop(chat_id, None)
+        if slot is None:
+            return False
+        chats = self.slots[slot]
+        chats.discard(chat_id)
+        if not chats:
+            del self.slots[slot]
+        STORE.drop_subscription(chat_id)
+        return True
+
+    def migrate(self, old_chat_id: int, new_chat_id: int):
+        slot = self.chat_slot.get(old_chat_id)
+        if slot is not None:
+            self.unsubscribe(old_chat_id)
+            self.subscribe(new_chat_id, slot)
+
+    def due_chats(self, minute: int) -> list:
+        # पिछले tick के बाद के सारे minutes (tick छूट गया हो तब भी कोई slot न छूटे)
+        # घड़ी पीछे गई (DST, NTP) तो gap पूरे दिन जैसा दिखता है: catch-up window से बड़ा gap = सिर्फ यही minute
+        last = self._last_minute
+        self._last_minute = minute
+        gap = (minute - last) % 1440 if last is not None else 0
+        if gap == 0 or gap > DAILY_CATCHUP_MINUTES:
+            minutes = [minute]
+        else:
+            minutes = [(last + i) % 1440 for i in range(1, gap + 1)]
+        due = []
+        for m in minutes:
+            due.extend(self.slots.get(m, ()))
+        return due
+
+
+DAILY = DailyScheduler()
+
+
+async def next_daily_question(chat_id: int) -> CompiledQuestion:
+    bank = BANK
+    return stream_question(bank, 0, chat_id, await take_questions(chat_id, bank, 0, 1))
+
+
+class OpenDaily:
+    # chat का आज का daily सवाल; हर user का सिर्फ पहला जवाब गिनता है (buttons और poll दोनों में)
+    __slots__ = ("question", "poll_id", "answered")
+
+    def __init__(self, question: CompiledQuestion):
+        self.question = question
+        self.poll_id = None
+        self.answered = set()  # user_id
+
+
+DAILY_OPEN = {}  # chat_id -> OpenDaily; नया daily आते ही पिछला score करना बंद
+DAILY_POLL_CHAT = {}  # poll_id -> chat_id, सिर्फ हर chat के आखिरी daily poll का
+
+
+def _daily_poll_sent(chat_id: int, message, question: CompiledQuestion):
+    daily = DAILY_OPEN.get(chat_id)
+    if daily is not None and daily.question is question:
+        daily.poll_id = message.poll.id
+        DAILY_POLL_CHAT[message.poll.id] = chat_id
+
+
+def score_daily_answer(bot_data: dict, chat_id: int, user, question: CompiledQuestion, option: int):
+    # daily का सही जवाब = 1 point (rounds वाले points board पर), हर user हर daily पर एक बार
+    ANALYTICS.record(question, option)
+    daily = DAILY_OPEN.get(chat_id)
+    if daily is None or daily.question.key != question.key or user.id in daily.answered:
+        return
+    daily.answered.add(user.id)
+    if option == question.correct:
+        add_points(bot_data, chat_id, user.id, display_name(user), 1)
+
+
+def queue_daily_question(chat_id: int, question: CompiledQuestion):
+    old = DAILY_OPEN.get(chat_id)
+    if old is not None and old.poll_id is not None:
+        DAILY_POLL_CHAT.pop(old.poll_id, None)
+    DAILY_OPEN[chat_id] = OpenDaily(question)
+    if POLL_MODE:
+        # quiz poll: Telegram grade करता है; non-anonymous ताकि PollAnswer से score leaderboard में जाए
+        OUTBOX.submit_poll(
+            chat_id,
+            functools.partial(_daily_poll_sent, question=question),
+            **poll_kwargs(question, is_anonymous=False),
+        )
+    else:
+        OUTBOX.submit(chat_id, question.daily_text, question.markup)
+
+
+@instrumented("daily_quiz_job")
+async def daily_quiz_job(context: ContextTypes.DEFAULT_TYPE):
+    chats = DAILY.due_chats(current_minute())
+    if not chats:
+        return
+
+    # हर chat को उसके अपने stream का अगला सवाल; memory में न हों तो offsets एक query में
+    await STREAMS.prefetch([(chat_id, ALL_DECK) for chat_id in chats])
+    for chat_id in chats:
+        queue_daily_question(chat_id, await next_daily_question(chat_id))
+    logger.info("daily quiz queued for %d chats", len(chats))
+
+
 # ---------- /daily_on ----------
+@instrumented("daily_on")
 async def daily_on(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await is_admin(update, context):
         await update.message.reply_text("केवल admin daily quiz सेट कर सकता है।")
@@ -485,52 +2526,323 @@ async def daily_on(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     chat_id = update.effective_chat.id
 
-    # पहले से job हो तो हटाओ
-    for job in context.job_queue.get_jobs_by_name(f"daily-{chat_id}"):
-        job.schedule_removal()
-
-    # रोज़ 24 घंटे पर दोहराने वाला job (अभी जिस समय चालू करोगे वही base रहेगा)
-    context.job_queue.run_repeating(
-        daily_quiz_job,
-        interval=timedelta(days=1),
-        first=5,  # 5 sec बाद पहला सवाल
-        name=f"daily-{chat_id}",
-        data={"chat_id": chat_id},
-    )
+    # रोज़ इसी समय (अभी जिस minute में चालू करोगे वही slot रहेगा)
+    if DAILY.subscribe(chat_id, current_minute()):
+        queue_daily_question(chat_id, await next_daily_question(chat_id))
 
     await update.message.reply_text("✅ इस चैट के लिए daily quiz चालू कर दिया गया है।")
 
 
 # ---------- /daily_off ----------
+@instrumented("daily_off")
 async def daily_off(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await is_admin(update, context):
         await update.message.reply_text("केवल admin daily quiz बंद कर सकता है।")
         return
 
     chat_id = update.effective_chat.id
-    jobs = context.job_queue.get_jobs_by_name(f"daily-{chat_id}")
-    for job in jobs:
-        job.schedule_removal()
-
-    if jobs:
+    if DAILY.unsubscribe(chat_id):
         await update.message.reply_text("⛔ Daily quiz बंद कर दिया गया है।")
     else:
         await update.message.reply_text("इस चैट के लिए कोई daily quiz सेट नहीं था।")
 
 
+# ---------- QUESTION BANK HOT RELOAD ----------
+async def bank_reload_job(context: ContextTypes.DEFAULT_TYPE):
+    global _bank_stamp
+    stamp = await asyncio.to_thread(_questions_stamp, QUESTIONS_DIR)
+    if stamp == _bank_stamp:
+        return
+    _bank_stamp = stamp
+    # parse + compile worker thread पर; event loop सिर्फ तैयार bank swap करता है
+    try:
+        bank = await asyncio.to_thread(load_bank, QUESTIONS_DIR)
+    except (OSError, ValueError) as exc:
+        logger.error("question bank reload failed, keeping v%s: %s", BANK.version, exc)
+        return
+    if bank.version != BANK.version:
+        install_bank(bank)
+        logger.info(
+            "question bank v%s loaded: %d questions, %d topics", bank.version, len(bank.table), len(bank.titles)
+        )
+
+
+# ---------- STARTUP / SHUTDOWN ----------
+_metrics_server = None
+_background_tasks = set()  # loop tasks का सिर्फ weak reference रखता है; यहां रखो ताकि बीच में GC न हों
+
+
+async def post_init(app):
+    await STORE.open()
+    app.bot_data["leaderboard"] = await STORE.load_leaderboard()
+    app.bot_data["points"] = await STORE.load_leaderboard("points", POINTS_BOARD_TITLE)
+
+    # adhure quiz वापस memory में (सिर्फ ताज़ा वाले, cap तक)
+    sessions = await STORE.load_sessions(SESSION_IDLE_TTL, SESSION_MAX)
+    for user_id, (sid, q_index, score) in sessions.items():
+        SESSIONS.put(user_id, QuizSession(sid, q_index, score))
+
+    # scrape के समय पढ़े जाने वाले gauges
+    METRICS.extend(
+        [
+            Gauge(
+                "quiz_active_sessions",
+                "Users with a quiz in progress",
+                SESSIONS.__len__,
+            ),
+            Gauge("quiz_update_backlog", "Updates received but not yet processed", lambda: update_backlog(app)),
+            Gauge("quiz_outbox_pending", "Outbound messages not yet delivered", lambda: OUTBOX._pending),
+            Gauge(
+                "telegram_http_in_flight",
+                "Bot API requests in flight per connection pool",
+                lambda: {name: pool.in_flight for name, pool in HTTP_POOLS.items()},
+                label="pool",
+            ),
+            Gauge(
+                "telegram_http_pool_size",
+                "Max connections per pool",
+                lambda: {name: pool.pool_size for name, pool in HTTP_POOLS.items()},
+                label="pool",
+            ),
+            Gauge("quiz_pending_timeouts", "Timed questions waiting for an answer", TIMERS.__len__),
+            Gauge("quiz_daily_subscriptions", "Chats with daily quiz on", lambda: len(DAILY.chat_slot)),
+        ]
+    )
+    if METRICS_PORT:
+        # metrics के लिए अलग छोटा server (webhook mode में भी; internal metrics public ingress पर नहीं)
+        global _metrics_server
+        _metrics_server = uvicorn.Server(
+            uvicorn.Config(
+                Starlette(routes=[Route("/metrics", metrics_endpoint, methods=["GET"])]),
+                host=METRICS_LISTEN,
+                port=METRICS_PORT,
+                log_level="warning",
+            )
+        )
+        task = asyncio.create_task(_metrics_server.serve())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    ANALYTICS.register(BANK)
+    ANALYTICS.load(await STORE.load_question_stats())
+    DAILY.load(await STORE.load_subscriptions())
+    OUTBOX.on_blocked = DAILY.unsubscribe
+    OUTBOX.on_migrated = DAILY.migrate
+    OUTBOX.start(app.bot)
+    if QUESTION_TIME_LIMIT:
+        # बिना time limit के कोई timer schedule नहीं होता; तब tick task भी नहीं
+        TIMERS.on_expire = functools.partial(expire_question, app)
+        TIMERS.start()
+
+    # हर minute की शुरुआत के ठीक बाद due slots भेजो
+    app.job_queue.run_repeating(session_sweep_job, interval=60, name="session-sweep")
+    app.job_queue.run_repeating(stats_flush_job, interval=STATS_FLUSH_INTERVAL, name="stats-flush")
+    if QUESTIONS_RELOAD_INTERVAL:
+        app.job_queue.run_repeating(bank_reload_job, interval=QUESTIONS_RELOAD_INTERVAL, name="bank-reload")
+    app.job_queue.run_repeating(
+        daily_quiz_job,
+        interval=60,
+        first=61 - time.localtime().tm_sec,
+        name="daily-dispatch",
+    )
+    logger.info(
+        "restored %d leaderboards, %d sessions, %d daily chats",
+        len(app.bot_data["leaderboard"]),
+        len(sessions),
+        len(DAILY.chat_slot),
+    )
+
+
+async def post_shutdown(app):
+    if _metrics_server is not None:
+        _metrics_server.should_exit = True
+    await TIMERS.stop()
+    await OUTBOX.stop()
+    ANALYTICS.flush()
+    await STORE.close()
+
+
+# ---------- UPDATE PROCESSOR (per-user ordering) ----------
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    # अलग users parallel, एक ही user के updates आने के क्रम में
+    # (double-tap दो बार grade न हो, q_index/score पर race न हो)
+    # concurrency limit यहीं अपने semaphore से: PTB वाला semaphore हर update को तुरंत अंदर आने देता है,
+    # ताकि backlog (limit या user queue पर रुके updates) गिना जा सके; update_queue तो तुरंत खाली हो जाती है
+    __slots__ = ("_queues", "_limit", "backlog")
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(1 << 30)
+        self._limit = asyncio.Semaphore(max_concurrent_updates)
+        self._queues = {}  # key -> deque; entry तभी है जब उस key का runner चल रहा हो
+        self.backlog = 0  # आए पर अभी पूरे नहीं हुए updates (रुके हुए + चल रहे)
+
+    @staticmethod
+    def key_for(update):
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user:
+            return update.effective_user.id
+        if update.effective_chat:
+            return update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update, coroutine):
+        self.backlog += 1
+        try:
+            await self._limit.acquire()
+        except BaseException:
+            self.backlog -= 1
+            coroutine.close()
+            raise
+        try:
+            await self._run_in_order(update, coroutine)
+        finally:
+            self._limit.release()
+
+    async def _run_in_order(self, update, coroutine):
+        key = self.key_for(update)
+        if key is None:
+            try:
+                await coroutine
+            finally:
+                self.backlog -= 1
+            return
+
+        pending = self._queues.get(key)
+        if pending is not None:
+            # runner पहले से है: उसकी queue में डालो और concurrency slot छोड़ दो
+            pending.append(coroutine)
+            return
+
+        pending = self._queues[key] = deque([coroutine])
+        try:
+            while pending:
+                try:
+                    await pending.popleft()
+                except Exception:
+                    logger.exception("update processing failed for key %s", key)
+                finally:
+                    self.backlog -= 1
+        finally:
+            # idle होते ही entry हटाओ; cancel हुआ हो तो बचे coroutines बंद करो
+            del self._queues[key]
+            for leftover in pending:
+                leftover.close()
+                self.backlog -= 1
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
+def update_backlog(app) -> int:
+    # fetcher के उठाने से पहले queue में + processor में रुके/चल रहे
+    return app.update_queue.qsize() + app.update_processor.backlog
+
+
+# ---------- WEBHOOK SERVER ----------
+def build_webhook_app(app, secret: str) -> Starlette:
+    async def telegram_webhook(request: Request) -> Response:
+        # secret के बिना कोई भी नकली update (जैसे admin बनकर /reset_board) भेज सकता है
+        token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not hmac.compare_digest(token.encode(), secret.encode()):
+            return Response(status_code=403)
+        try:
+            data = await request.json()
+        except ValueError:
+            return Response(status_code=400)
+
+        # queue में डालो और तुरंत 200; processing Application के workers करेंगे
+        await app.update_queue.put(Update.de_json(data, app.bot))
+        return Response()
+
+    async def health(request: Request) -> Response:
+        return JSONResponse(
+            {"ok": app.running, "queued_updates": update_backlog(app)},
+            status_code=200 if app.running else 503,
+        )
+
+    return Starlette(
+        routes=[
+            Route(WEBHOOK_PATH, telegram_webhook, methods=["POST"]),
+            Route("/healthz", health, methods=["GET"]),
+        ]
+    )
+
+
+async def run_webhook(app):
+    secret = WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    server = uvicorn.Server(
+        uvicorn.Config(
+            build_webhook_app(app, secret),
+            host=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            log_level="warning",
+        )
+    )
+
+    # run_polling/run_webhook की तरह post_init/post_shutdown यहां खुद बुलाने होंगे
+    async with app:
+        await post_init(app)
+        await app.bot.set_webhook(
+            url=WEBHOOK_URL + WEBHOOK_PATH,
+            secret_token=secret,
+            allowed_updates=Update.ALL_TYPES,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+        )
+        await app.start()
+        try:
+            await server.serve()
+        finally:
+            await app.stop()
+    await post_shutdown(app)
+
+
 # ---------- MAIN ----------
-def main():
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+def build_app():
+    builder = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .base_url(TELEGRAM_BASE_URL)
+        .request(InstrumentedRequest("sends", HTTP_POOL_SIZE, read_timeout=HTTP_READ_TIMEOUT))
+        .get_updates_request(InstrumentedRequest("updates", 1))
+        .concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if SEND_COALESCE:
+        builder.rate_limiter(SendCoalescer())
+    app = builder.build()
 
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("quiz", quiz_command))
     app.add_handler(CommandHandler("leaderboard", leaderboard))
+    app.add_handler(CommandHandler("export", export_command))
+    app.add_handler(CommandHandler("reset_board", reset_board_command))
     app.add_handler(CommandHandler("daily_on", daily_on))
     app.add_handler(CommandHandler("daily_off", daily_off))
 
-    app.add_handler(CallbackQueryHandler(handle_answer, pattern=r"^answer_"))
+    # "answer_" = पुराने version के बटन; handle_answer उन्हें expired बताता है
+    app.add_handler(CallbackQueryHandler(answer_gate, pattern=r"^a\."), group=-1)
+    app.add_handler(CallbackQueryHandler(handle_answer, pattern=r"^(a\.|answer_)"))
+    app.add_handler(CommandHandler("round", round_command))
+    app.add_handler(CommandHandler("stats", stats_command))
+    app.add_handler(CallbackQueryHandler(handle_round_answer, pattern=r"^r\."))
+    app.add_handler(PollAnswerHandler(on_poll_answer))
+    app.add_handler(ChatMemberHandler(on_chat_member, ChatMemberHandler.ANY_CHAT_MEMBER))
+    return app
 
-    app.run_polling()
+
+def main():
+    app = build_app()
+
+    if WEBHOOK_URL:
+        asyncio.run(run_webhook(app))
+    else:
+        # chat_member updates Telegram default में नहीं भेजता
+        app.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,41 @@
+import pytest
+
+import bot
+
+
+@pytest.fixture(autouse=True)
+def no_db(monkeypatch):
+    monkeypatch.setattr(bot.STORE, "save_score", lambda *args: None)
+    monkeypatch.setattr(bot.STORE, "save_points", lambda *args: None)
+
+
+def test_round_points_do_not_touch_best_quiz_score():
+    bot_data = {}
+    bot.submit_score(bot_data, -1, 7, "Ann", 20)
+    for _ in range(3):
+        bot.add_points(bot_data, -1, 7, "Ann", 1)
+    assert bot_data["leaderboard"][-1].entries[7]["score"] == 20
+    assert bot_data["points"][-1].entries[7]["score"] == 3
+
+    bot.submit_score(bot_data, -1, 7, "Ann", 22)
+    assert bot_data["leaderboard"][-1].entries[7]["score"] == 22
+
+
+def test_daily_answer_scores_once_per_user(monkeypatch):
+    monkeypatch.setattr(bot, "DAILY_OPEN", {})
+    monkeypatch.setattr(bot.OUTBOX, "submit", lambda *args, **kwargs: None)
+    monkeypatch.setattr(bot.ANALYTICS, "record", lambda *args: None)
+    question, other = bot.BANK.table[0], bot.BANK.table[1]
+    user = type("User", (), {"id": 7, "full_name": "Ann", "username": None})()
+    bot_data = {}
+
+    bot.queue_daily_question(-1, question)
+    bot.score_daily_answer(bot_data, -1, user, question, question.correct)
+    bot.score_daily_answer(bot_data, -1, user, question, question.correct)  # दोबारा tap
+    bot.score_daily_answer(bot_data, -1, user, other, other.correct)  # पुराना daily
+    assert bot_data["points"][-1].entries[7]["score"] == 1
+    assert "leaderboard" not in bot_data
+
+    bot.queue_daily_question(-1, other)
+    bot.score_daily_answer(bot_data, -1, user, other, other.correct)
+    assert bot_data["points"][-1].entries[7]["score"] == 2
@@ -0,0 +1,26 @@
+import bot
+
+
+def make_scheduler():
+    daily = bot.DailyScheduler()
+    daily.load({chat_id: chat_id * 10 for chat_id in range(144)})  # हर 10 minute पर एक chat
+    return daily
+
+
+def test_missed_ticks_catch_up():
+    daily = make_scheduler()
+    daily.due_chats(600)
+    assert sorted(daily.due_chats(625)) == [61, 62]
+
+
+def test_clock_step_back_does_not_resend_whole_day():
+    daily = make_scheduler()
+    assert daily.due_chats(600) == [60]
+    assert daily.due_chats(599) == []
+    assert daily.due_chats(600) == [60]
+
+
+def test_same_minute_twice_only_current_minute():
+    daily = make_scheduler()
+    daily.due_chats(600)
+    assert daily.due_chats(600) == [60]
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+import bot
+
+
+def make_bank(n: int) -> bot.QuestionBank:
+    raw = [{"question": f"q{i}", "options": ["x", "y"], "correct": "A"} for i in range(n)]
+    table = bot.compile_questions(raw, 1)
+    return bot.QuestionBank(1, table, {"t": "t"}, {bot.ALL_DECK: tuple(range(n))})
+
+
+@pytest.fixture(autouse=True)
+def fresh_streams(monkeypatch):
+    async def nothing_stored(keys):
+        return {}
+
+    monkeypatch.setattr(bot, "STREAMS", bot.StreamCache(4))
+    monkeypatch.setattr(bot.STORE, "save_stream", lambda *args: None)
+    monkeypatch.setattr(bot.STORE, "find_streams", nothing_stored)
+
+
+def take(owner_id, bank, count):
+    return asyncio.run(bot.take_questions(owner_id, bank, 0, count))
+
+
+@pytest.mark.parametrize("n, length", [(30, 25), (25, 25), (7, 3), (10, 1)])
+def test_quiz_never_repeats_a_question(n, length):
+    bank = make_bank(n)
+    for _ in range(20):
+        start = take(42, bank, length)
+        shown = [bot.stream_question(bank, 0, 42, start + pos) for pos in range(length)]
+        assert len(set(shown)) == length
+
+
+def test_unaligned_stream_does_not_repeat():
+    # daily/round stream को 1 आगे बढ़ा दे, फिर पूरा quiz उसी stream से
+    bank = make_bank(30)
+    take(7, bank, 1)
+    start = take(7, bank, 30)
+    shown = [bot.stream_question(bank, 0, 7, start + pos) for pos in range(30)]
+    assert len(set(shown)) == 30
+
+
+def test_evicted_stream_resumes_from_store(tmp_path, monkeypatch):
+    # cache से निकला offset DB से वापस, pending write हो या flush हो चुका हो
+    async def scenario():
+        store = bot.QuizStore(str(tmp_path / "quiz.db"), 60)
+        await store.open()
+        monkeypatch.setattr(bot, "STORE", store)
+        cache = bot.StreamCache(1)
+        monkeypatch.setattr(bot, "STREAMS", cache)
+        bank = make_bank(30)
+
+        assert await bot.take_questions(1, bank, 0, 5) == 0
+        assert await bot.take_questions(2, bank, 0, 5) == 0  # user 1 evict, offset अभी pending
+        assert await bot.take_questions(1, bank, 0, 5) == 5
+        await store.flush()
+        assert await bot.take_questions(2, bank, 0, 5) == 5  # flush के बाद DB से
+        assert len(cache) == 1
+        await store.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import bot
+
+
+class FakeAPI:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    async def __call__(self, endpoint, data, **kwargs):
+        self.calls.append(data)
+        message_id = len(self.calls)
+        await asyncio.sleep(self.delay)
+        return message_id
+
+
+def send(coalescer, api, text, chat_id=1, markup=None):
+    data = {"chat_id": chat_id, "text": text}
+    if markup is not None:
+        data["reply_markup"] = markup
+    return coalescer.process_request(api, ("sendMessage", data), {}, "sendMessage", data, None)
+
+
+def test_lone_send_is_not_held():
+    async def scenario():
+        coalescer, api = bot.SendCoalescer(), FakeAPI()
+        started = time.perf_counter()
+        for text in ("a", "b", "c"):
+            await send(coalescer, api, text)
+        assert time.perf_counter() - started < 0.005
+        assert [c["text"] for c in api.calls] == ["a", "b", "c"]
+
+    asyncio.run(scenario())
+
+
+def test_sends_started_together_merge_in_order():
+    async def scenario():
+        coalescer, api = bot.SendCoalescer(), FakeAPI()
+        results = await asyncio.gather(
+            send(coalescer, api, "feedback"),
+            send(coalescer, api, "explanation"),
+            send(coalescer, api, "question", markup="kb"),
+            send(coalescer, api, "other chat", chat_id=2),
+        )
+        assert api.calls == [
+            {"chat_id": 1, "text": "feedback\n\nexplanation\n\nquestion", "reply_markup": "kb"},
+            {"chat_id": 2, "text": "other chat"},
+        ]
+        assert results[0] == results[1] == results[2] != results[3]
+
+    asyncio.run(scenario())
+
+
+def test_sends_during_in_flight_send_wait_and_merge():
+    async def scenario():
+        coalescer, api = bot.SendCoalescer(), FakeAPI(delay=0.02)
+        first = asyncio.create_task(send(coalescer, api, "one"))
+        await asyncio.sleep(0.005)  # "one" अभी API पर है
+        await asyncio.gather(first, send(coalescer, api, "two"), send(coalescer, api, "three"))
+        assert [c["text"] for c in api.calls] == ["one", "two\n\nthree"]
+
+    asyncio.run(scenario())
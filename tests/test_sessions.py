@@ -0,0 +1,46 @@
+import asyncio
+import sqlite3
+
+import bot
+
+
+def test_finished_quiz_survives_restart(tmp_path):
+    path = str(tmp_path / "quiz.db")
+
+    async def scenario():
+        store = bot.QuizStore(path, 60)
+        await store.open()
+        store.save_session(1, 111, 4, 3)
+        store.save_session(2, 222, bot.QUIZ_FINISHED, 0)
+        assert await store.find_session(2, 3600) == (222, bot.QUIZ_FINISHED, 0)
+        await store.close()
+
+        # restart: अधूरा quiz sid के साथ वापस, पूरा हुआ memory में नहीं पर DB में finished
+        store = bot.QuizStore(path, 60)
+        await store.open()
+        assert await store.load_sessions(3600, 10) == {1: (111, 4, 3)}
+        assert await store.find_session(2, 3600) == (222, bot.QUIZ_FINISHED, 0)
+        assert await store.find_session(3, 3600) is None
+        await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_old_sessions_table_gets_sid_column(tmp_path):
+    path = str(tmp_path / "quiz.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE sessions (user_id INTEGER PRIMARY KEY, q_index INTEGER NOT NULL, "
+        "score INTEGER NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO sessions VALUES (5, 2, 1, strftime('%s','now'))")
+    conn.commit()
+    conn.close()
+
+    async def scenario():
+        store = bot.QuizStore(path, 60)
+        await store.open()
+        assert await store.load_sessions(3600, 10) == {5: (0, 2, 1)}
+        await store.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,25 @@
+import asyncio
+
+import bot
+
+
+def test_backlog_counts_waiting_and_running_updates():
+    async def scenario():
+        processor = bot.PerUserUpdateProcessor(1)
+        gate = asyncio.Event()
+        done = []
+
+        async def work(n):
+            await gate.wait()
+            done.append(n)
+
+        tasks = [asyncio.create_task(processor.process_update(object(), work(n))) for n in range(5)]
+        await asyncio.sleep(0)
+        # एक चल रहा, चार slot के इंतज़ार में; PTB के semaphore पर कोई नहीं अटका
+        assert processor.backlog == 5
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert processor.backlog == 0
+        assert done == [0, 1, 2, 3, 4]
+
+    asyncio.run(scenario())